@@ -1,4 +1,8 @@
 from .functions import *
 from .draw import *
 from .font import Font
+from .palette import Palette
+from .shapes import ShapeCache
+from .layer import ColorLayer
 from .surface import Surface, PygameSurface
+from .terminal import TerminalRenderer, TerminalInput
@@ -1,5 +1,9 @@
 # file of drawing functions that can be used on CellSurface
 
+import math
+
+import numpy as np
+
 from .functions import *
 
 # directions for flood_fill
@@ -8,6 +12,29 @@ DIAGONAL = ((1, 1), (-1, 1), (-1, -1), (1, -1))
 CHEBYSHEV = (*ORTHOGONAL, *DIAGONAL)
 
 
+def grid_steps(start, stop):
+    """Returns a list of the values from start up to stop, stepping by one.
+    Values are added up one step at a time, so they match loops that do the same."""
+    values = []
+    while start <= stop:
+        values.append(start)
+        start += 1
+    return values
+
+
+def bounding_points(center, rx, ry):
+    """Returns an array of the floored points found by looping through the bounding rectangle of
+    an ellipse, with shape (N, 2). Points can repeat when the rectangle isn't on whole numbers."""
+    xs = floor_points(np.array(grid_steps(center[0] - rx, center[0] + rx)))
+    ys = floor_points(np.array(grid_steps(center[1] - ry, center[1] + ry)))
+    return np.stack(np.meshgrid(xs, ys, indexing="ij"), -1).reshape(-1, 2)
+
+
+def point_set(points):
+    """Returns an array of points with shape (N, 2) as a set of tuples."""
+    return set(map(tuple, points.tolist()))
+
+
 def horizontal_line(p, length):
     """Returns a set of points that make a horizontal line with given length."""
     points = set()
@@ -24,42 +51,111 @@ def vertical_line(p, length):
     return points
 
 
-def dda_line(p1, p2):
-    """Returns a set of points between p1 and p2 to draw a dda line."""
-    # Return if same point.
-    if p1 == p2:
-        return [p1]
-    # Initialize the points list.
-    points = []
-    # Find number of points to linear interpolate to.
-    n = diagonal_distance(p1, p2)
-    # Do n+1 linear interpolations.
-    for i in range(n + 1):
-        # Linear interpolate the point, round to nearest integer point, add to list.
-        points.append(round_point(lerp_point(p1, p2, i / n)))
-    # Return the points list.
-    return points
-
-
-def orthogonal_line(p1, p2):
-    """Returns a set of points between p1 and p2 to draw an orthogonal line.
-    When the line passes through a diagonal, vertical steps are chosen."""
-    # cannot handle vertical or horizontal lines
-    if p1[0] == p2[0] or p1[1] == p2[1]:
-        # delegate to dda_line
-        return dda_line(p1, p2)
+def segment_arrays(starts, ends):
+    """Returns the start and end points of line segments as two arrays with shape (N, 2).
+    A single start and end point make one segment."""
+    starts = np.asarray(starts).reshape(-1, 2)
+    ends = np.asarray(ends).reshape(-1, 2)
+    return starts, ends
+
+
+def segment_indices(counts):
+    """Given an array of point counts per segment, returns the segment of every point
+    and the index of every point within its segment."""
+    segments = np.repeat(np.arange(len(counts)), counts)
+    firsts = np.cumsum(counts) - counts
+    return segments, np.arange(len(segments)) - firsts[segments]
+
+
+def dda_lines(starts, ends):
+    """Returns the points of many dda lines at once, for arrays of start and end points with shape (N, 2).
+    Returns an array of all the points with shape (M, 2), and an array of the segment each point is on,
+    with the points of every segment in order from start to end. The points are rounded to integers."""
+    starts, ends = segment_arrays(starts, ends)
+    # find number of points to linear interpolate to
+    n = np.abs(ends - starts).max(1, initial=0).astype(np.int64)
+    same = (starts == ends).all(1)
+    if (n[~same] == 0).any():
+        raise ZeroDivisionError("Line points must be at least one cell apart.")
+    # do n+1 linear interpolations, or one for the same point
+    segments, steps = segment_indices(np.where(same, 1, n + 1))
+    t = steps / np.where(same, 1, n)[segments]
+    # linear interpolate the points, round to nearest integer point
+    return round_points(lerp_points(starts[segments], ends[segments], t)), segments
+
+
+def merged_lines(starts, ends, diagonal):
+    """Returns the points and segments of many orthogonal lines, or supercover lines if diagonal is True.
+    Each horizontal and vertical step of a line has the key (0.5 + i) / n, i being the index of the step
+    and n the number of steps that way, and the steps are taken in the order of their keys.
+    Vertical steps are taken first on equal keys, or together with the horizontal step if diagonal is True.
+    The keys are compared as the whole numbers (2 * i + 1) * ny and (2 * j + 1) * nx, so no sorting is needed.
+    Lines whose ends aren't a whole number of cells apart are stepped one at a time with stepped_line."""
+    starts, ends = segment_arrays(starts, ends)
+    # get distances, abs distances, and signs
+    deltas = ends - starts
+    fractional = (deltas != np.round(deltas)).any(1)
+    if fractional.any():
+        # merge the whole lines with the stepped ones, keeping the points in segment order
+        whole = np.flatnonzero(~fractional)
+        points, segments = merged_lines(starts[whole], ends[whole], diagonal)
+        segments = whole[segments]
+        for segment in np.flatnonzero(fractional).tolist():
+            stepped = stepped_line(starts[segment].tolist(), ends[segment].tolist(), diagonal)
+            points = np.concatenate((points, np.array(stepped, np.int64)))
+            segments = np.concatenate((segments, np.full(len(stepped), segment)))
+        order = np.argsort(segments, kind="stable")
+        return points[order], segments[order]
+    nx, ny = np.abs(deltas).astype(np.int64).T
+    signs = np.sign(deltas).astype(np.int64)
+    # every segment is its starting point followed by its steps
+    counts = nx + ny + 1
+    segments, _ = segment_indices(counts)
+    firsts = np.cumsum(counts) - counts
+    # horizontal steps go after every vertical step with a smaller or equal key
+    h_segments, h_steps = segment_indices(nx)
+    h_keys, h_lengths = (2 * h_steps + 1) * ny[h_segments], nx[h_segments]
+    h_slots = firsts[h_segments] + 1 + h_steps + (h_keys + h_lengths) // (2 * h_lengths)
+    horizontal = np.zeros(len(segments), np.bool_)
+    horizontal[h_slots] = True
+    vertical = ~horizontal
+    vertical[firsts] = False
+    keep = np.ones(len(segments), np.bool_)
+    if diagonal:
+        # a vertical step with the same key is right before its horizontal step, so join them
+        tied = h_slots[(h_keys % h_lengths == 0) & (h_keys // h_lengths % 2 == 1)]
+        vertical[tied] = True
+        keep[tied - 1] = False
+        vertical[tied - 1] = False
+    # walk the steps from the start of each segment
+    moves = np.stack((horizontal * signs[segments, 0], vertical * signs[segments, 1]), -1)
+    totals = np.cumsum(moves, 0)
+    points = starts[segments] + (totals - totals[firsts][segments])
+    return floor_points(points[keep]), segments[keep]
+
+
+def stepped_line(p1, p2, diagonal):
+    """Returns the points of one orthogonal line, or supercover line if diagonal is True, one step at a time.
+    Used by merged_lines for lines whose ends aren't a whole number of cells apart."""
     # get distances, abs distances, and signs
     dx, dy = p2[0] - p1[0], p2[1] - p1[1]
     nx, ny = math.fabs(dx), math.fabs(dy)
     sign_x, sign_y = math.copysign(1, dx), math.copysign(1, dy)
     # make point list and variables
     p = [p1[0], p1[1]]
-    points = set()
-    points.add((p[0], p[1]))
+    points = [(int(p[0]), int(p[1]))]
     ix = iy = 0
-    # loop through line
+    # loop through line, an axis without distance never steps
     while ix < nx or iy < ny:
-        if (0.5 + ix) / nx < (0.5 + iy) / ny:
+        key_x = (0.5 + ix) / nx if nx else math.inf
+        key_y = (0.5 + iy) / ny if ny else math.inf
+        if diagonal and key_x == key_y:
+            # diagonal step
+            p[0] += sign_x
+            p[1] += sign_y
+            ix += 1
+            iy += 1
+        elif key_x < key_y:
             # horizontal step
             p[0] += sign_x
             ix += 1
@@ -68,10 +164,44 @@ def orthogonal_line(p1, p2):
             p[1] += sign_y
             iy += 1
         # add new point, making sure to cast coordinates to integers
-        points.add((int(p[0]), int(p[1])))
+        points.append((int(p[0]), int(p[1])))
     return points
 
 
+def orthogonal_lines(starts, ends):
+    """Returns the points of many orthogonal lines at once, like dda_lines.
+    When a line passes through a diagonal, vertical steps are chosen. The points are truncated to integers."""
+    return merged_lines(starts, ends, False)
+
+
+def supercover_lines(starts, ends):
+    """Returns the points of many supercover lines at once, like dda_lines.
+    Lines step diagonally when they pass through a diagonal. The points are truncated to integers."""
+    return merged_lines(starts, ends, True)
+
+
+def dda_line(p1, p2):
+    """Returns a set of points between p1 and p2 to draw a dda line."""
+    # Return if same point.
+    if p1 == p2:
+        return [p1]
+    # Return the points list.
+    return list(map(tuple, dda_lines(p1, p2)[0].tolist()))
+
+
+def orthogonal_line(p1, p2):
+    """Returns a set of points between p1 and p2 to draw an orthogonal line.
+    When the line passes through a diagonal, vertical steps are chosen."""
+    # cannot handle vertical or horizontal lines
+    if p1[0] == p2[0] or p1[1] == p2[1]:
+        # delegate to dda_line
+        return dda_line(p1, p2)
+    points = list(map(tuple, orthogonal_lines(p1, p2)[0].tolist()))
+    # the first point is kept as given
+    points[0] = p1[0], p1[1]
+    return set(points)
+
+
 def supercover_line(p1, p2):
     """Returns a set of points between p1 and p2 to draw a supercover line.
     Supercover is like orthogonal, except it supports diagonal steps."""
@@ -79,32 +209,9 @@ def supercover_line(p1, p2):
     if p1[0] == p2[0] or p1[1] == p2[1]:
         # delegate to dda_line
         return dda_line(p1, p2)
-    # get distances, abs distances, and signs
-    dx, dy = p2[0] - p1[0], p2[1] - p1[1]
-    nx, ny = math.fabs(dx), math.fabs(dy)
-    sign_x, sign_y = math.copysign(1, dx), math.copysign(1, dy)
-    # make point list and variables
-    p = [p1[0], p1[1]]
-    points = [(p[0], p[1])]
-    ix = iy = 0
-    # loop through line
-    while ix < nx or iy < ny:
-        if (0.5 + ix) / nx == (0.5 + iy) / ny:
-            # diagonal step
-            p[0] += sign_x
-            p[1] += sign_y
-            ix += 1
-            iy += 1
-        elif (0.5 + ix) / nx < (0.5 + iy) / ny:
-            # horizontal step
-            p[0] += sign_x
-            ix += 1
-        else:
-            # vertical step
-            p[1] += sign_y
-            iy += 1
-        # add new point, making sure to cast coordinates to integers
-        points.append((int(p[0]), int(p[1])))
+    points = list(map(tuple, supercover_lines(p1, p2)[0].tolist()))
+    # the first point is kept as given
+    points[0] = p1[0], p1[1]
     return points
 
 
@@ -114,24 +221,9 @@ def filled_circle(center, radius):
     STYLE GUIDE:
     If center is N.0, radius should be N.5.
     If center is N.5, radius should be N.0."""
-    points = set()
-    # create dimensions for bounding rectangle
-    top = center[1] - radius
-    bottom = center[1] + radius
-    left = center[0] - radius
-    right = center[0] + radius
-    # begin looping through bounding rectangle
-    y = top
-    while y <= bottom:
-        x = left
-        while x <= right:
-            p = floor_point((x, y))
-            # if it is inside the radius, add it to the set
-            if point_in_circle(p, center, radius):
-                points.add(p)
-            x += 1
-        y += 1
-    return points
+    # test every point of the bounding rectangle at once
+    points = bounding_points(center, radius, radius)
+    return point_set(points[points_in_circle(points, center, radius)])
 
 
 def outline_circle(center, radius):
@@ -244,22 +336,14 @@ def circle_pie(center, radius, start_angle, stop_angle, width=0):
     STYLE GUIDE:
     If center is N.0, radius should be N.5.
     If center is N.5, radius should be N.0."""
-    points = set()
-    # get standard filled circle
-    circle_points = draw_circle(center, radius, width)
-    # loop through points
-    for p in circle_points:
-        # get angle
-        angle = math.degrees(angle_between_points(center, p, True))
-        # if angle is within limits, add point
-        if angle_in_arc(angle, start_angle, stop_angle):
-            points.add(p)
-        # special case when angle equals zero
-        elif angle == 0:
-            # always add center point
-            if p == floor_point(center):
-                points.add(p)
-    return points
+    # get standard filled circle as an array
+    points = np.array(list(draw_circle(center, radius, width)), np.int64).reshape(-1, 2)
+    # get all the angles
+    angles = np.degrees(angles_between_points(center, points, True))
+    # keep points with angles within limits, and always keep the center point
+    keep = angles_in_arc(angles, start_angle, stop_angle)
+    keep |= (angles == 0) & (points == floor_point(center)).all(1)
+    return point_set(points[keep])
 
 
 def filled_ellipse(center, rx, ry):
@@ -268,24 +352,11 @@ def filled_ellipse(center, rx, ry):
     STYLE GUIDE:
     If center is N.0, radii should be N.5.
     If center is N.5, radii should be N.0."""
-    points = set()
-    # create dimensions for bounding rectangle
-    top = center[1] - ry
-    bottom = center[1] + ry
-    left = center[0] - rx
-    right = center[0] + rx
-    # begin looping through bounding rectangle
-    y = top
-    while y <= bottom:
-        x = left
-        while x <= right:
-            p = floor_point((x, y))
-            # if it is inside the radii, add it to the set
-            if point_in_ellipse(p, center, rx, ry):
-                points.add(p)
-            x += 1
-        y += 1
-    return points
+    # test every point of the bounding rectangle at once
+    points = bounding_points(center, rx, ry)
+    if not len(points):
+        return set()
+    return point_set(points[points_in_ellipse(points, center, rx, ry)])
 
 
 def outline_ellipse(center, rx, ry):
@@ -398,22 +469,14 @@ def ellipse_pie(center, rx, ry, start_angle, stop_angle, width=0):
     STYLE GUIDE:
     If center is N.0, radii should be N.5.
     If center is N.5, radii should be N.0."""
-    points = set()
-    # get standard filled ellipse
-    ellipse_points = draw_ellipse(center, rx, ry, width)
-    # loop through points
-    for p in ellipse_points:
-        # get angle
-        angle = math.degrees(angle_between_points(center, p, True))
-        # if angle is within limits, add point
-        if angle_in_arc(angle, start_angle, stop_angle):
-            points.add(p)
-        # special case when angle equals zero
-        elif angle == 0:
-            # always add center point
-            if p == floor_point(center):
-                points.add(p)
-    return points
+    # get standard filled ellipse as an array
+    points = np.array(list(draw_ellipse(center, rx, ry, width)), np.int64).reshape(-1, 2)
+    # get all the angles
+    angles = np.degrees(angles_between_points(center, points, True))
+    # keep points with angles within limits, and always keep the center point
+    keep = angles_in_arc(angles, start_angle, stop_angle)
+    keep |= (angles == 0) & (points == floor_point(center)).all(1)
+    return point_set(points[keep])
 
 
 def draw_rect(rect, filled=True):
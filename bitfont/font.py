@@ -5,6 +5,7 @@
 import re
 from pathlib import Path
 
+import numpy as np
 import pygame as pg
 
 # RegEx for checking file name for name, width, and height of font.
@@ -37,10 +38,14 @@ class Font:
         self.width = self.image.get_width() // self.pixel_width
         self.height = self.image.get_height() // self.pixel_height
         self.size = self.width, self.height
+        # Boolean masks of the lit pixels of every tile, made on first use.
+        self.masks = None
 
     def get_tile(self, tile_id: int) -> pg.Surface:
         """Given a tile ID, returns a pygame.Surface with dimensions of self.size.
         Invalid tile IDs will raise an IndexError."""
+        # Convert NumPy integers from the tile arrays so the pixel math can't overflow.
+        tile_id = int(tile_id)
         # Raise IndexError if tile ID is out of range.
         if not (0 <= tile_id < self.width * self.height):
             raise IndexError(f"Tile ID out of range: {tile_id}")
@@ -52,3 +57,16 @@ class Font:
         # Blit correct tile from font image onto the tile Surface.
         tile.blit(self.image, (0, 0), (x * self.pixel_width, y * self.pixel_height, *self.pixel_size))
         return tile
+
+    def get_masks(self) -> np.ndarray:
+        """Returns a (tiles, pixel_width, pixel_height) boolean array of the lit pixels of every tile.
+        Pixels that are black or the color key of the font image are not lit."""
+        if self.masks is None:
+            pixels = pg.surfarray.array3d(self.image)[:self.width * self.pixel_width, :self.height * self.pixel_height]
+            lit = pixels.any(2)
+            if (colorkey := self.image.get_colorkey()) is not None:
+                lit &= (pixels != colorkey[:3]).any(2)
+            # Split the image into tiles, numbered across the rows.
+            lit = lit.reshape(self.width, self.pixel_width, self.height, self.pixel_height)
+            self.masks = lit.transpose(2, 0, 1, 3).reshape(-1, self.pixel_width, self.pixel_height)
+        return self.masks
@@ -2,6 +2,8 @@
 
 import math
 
+import numpy as np
+
 
 def points_to_rect(p1, p2):
     """Given two points, returns rect bound by p1 and p2."""
@@ -167,6 +169,107 @@ def manhattan_distance(p1, p2):
     return int(math.fabs(dx) + math.fabs(dy))
 
 
+def scroll_slices(size, dx, dy):
+    """Returns the destination and source slices of the cells that stay on a grid of given size,
+    when every cell moves by dx and dy. Use them as array[dst] = array[src]."""
+    w, h = size
+    dst = slice(max(dx, 0), w + min(dx, 0)), slice(max(dy, 0), h + min(dy, 0))
+    src = slice(max(-dx, 0), w + min(-dx, 0)), slice(max(-dy, 0), h + min(-dy, 0))
+    return dst, src
+
+
+def scroll_rects(size, dx, dy):
+    """Returns a list of rects (x, y, w, h) of the cells scrolled in on a grid of given size,
+    when every cell moves by dx and dy. The move must be smaller than the size."""
+    w, h = size
+    rects = []
+    # the columns scrolled in, the whole height
+    if dx:
+        rects.append((0 if dx > 0 else w + dx, 0, abs(dx), h))
+    # the rows scrolled in, leaving out the columns
+    if dy:
+        rects.append((max(dx, 0), 0 if dy > 0 else h + dy, w - abs(dx), abs(dy)))
+    return rects
+
+
+# Batch versions of the point functions above, for testing many points in one call.
+# Points are given as arrays of shape (N, 2), and any single point can stand in for an array.
+
+
+def points_distances(p1, p2):
+    """Returns the x and y differences between two arrays of points, as a tuple of two arrays."""
+    p1, p2 = np.asarray(p1), np.asarray(p2)
+    return p2[..., 0] - p1[..., 0], p2[..., 1] - p1[..., 1]
+
+
+def angles_between_points(p1, p2, full_circle=False, negate_y=True):
+    """Array version of angle_between_points, returns an array of angles in radians.
+    The angles can differ from math.atan2() in the last bit."""
+    dx, dy = points_distances(p1, p2)
+    # negate for video graphics negative y axis
+    if negate_y:
+        dy = -dy
+    angles = np.arctan2(dy, dx)
+    # if full_circle, then change negative angles into angles between 0 and math.tau
+    if full_circle:
+        angles = np.where(angles < 0, angles + math.tau, angles)
+    return angles
+
+
+def dists_sqrd_between_points(p1, p2):
+    """Array version of dist_sqrd_between_points, returns an array of squared distances."""
+    dx, dy = points_distances(p1, p2)
+    return dx ** 2 + dy ** 2
+
+
+def angles_in_arc(angles, start_angle, stop_angle):
+    """Array version of angle_in_arc, returns a boolean array of which angles lie within the arc.
+    The start_angle and stop_angle are single angles, all in degrees."""
+    # normalize all angles with modulo, this works with negative numbers too
+    angles = np.mod(angles, 360)
+    start_angle %= 360
+    stop_angle %= 360
+    # if the arc is just a line, angles must be equal to the line
+    if start_angle == stop_angle:
+        return angles == start_angle
+    # if the zero line has been crossed, adjust stop_angle and the angles over (or on) the zero line
+    if start_angle > stop_angle:
+        stop_angle += 360
+        angles = np.where((0 <= angles) & (angles < start_angle), angles + 360, angles)
+    return (start_angle <= angles) & (angles <= stop_angle)
+
+
+def points_in_circle(points, center, radius):
+    """Array version of point_in_circle, returns a boolean array of which points are inside the circle."""
+    return dists_sqrd_between_points(points, center) <= radius ** 2
+
+
+def points_in_ellipse(points, center, rx, ry):
+    """Array version of point_in_ellipse, returns a boolean array of which points are inside the ellipse.
+    Raises ZeroDivisionError for a zero axis, like point_in_ellipse."""
+    if rx == 0 or ry == 0:
+        raise ZeroDivisionError("Ellipse axes must not be zero.")
+    dx, dy = points_distances(points, center)
+    return (dx ** 2 / rx ** 2) + (dy ** 2 / ry ** 2) <= 1
+
+
+def lerp_points(p1, p2, t):
+    """Array version of lerp_point, lerps between two points at every t of an array.
+    Returns an array of float points with shape (N, 2)."""
+    p1, p2 = np.asarray(p1), np.asarray(p2)
+    return p1 + np.asarray(t)[..., None] * (p2 - p1)
+
+
+def round_points(points):
+    """Array version of round_point, rounds to the nearest integers with ties to even, like python rounding."""
+    return np.rint(points).astype(np.int64)
+
+
+def floor_points(points):
+    """Array version of floor_point, truncates the coordinates to integers."""
+    return np.trunc(points).astype(np.int64)
+
+
 def simple_direction(p1, p2):
     """Takes two points and gives one of the nine directions from p1 to p2.
     The nine directions are arranged on a grid:
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Contains the ColorLayer class for compositing background colors beneath a PygameSurface."""
+
+from typing import Sequence, Union
+
+import numpy as np
+import pygame as pg
+
+from .functions import scroll_slices, scroll_rects
+# For type hints only.
+from .font import Font
+
+
+class ColorLayer:
+    """Grid of background colors shown beneath the tiles of a PygameSurface.
+    Black cells of the layer are see through, and so are black pixels of the surface above it.
+    Add a layer with PygameSurface.add_layer and show or hide it with the enabled attribute."""
+
+    def __init__(self, size: Sequence[int], font: Font, enabled: bool = True):
+        """Given a size in cells and a font for the cell size, returns a layer filled with black."""
+        # Raise ValueError on invalid size argument.
+        if len(size) != 2:
+            raise ValueError("Size must be of length two; (width, height).")
+        # Create width, height, and size attributes.
+        self.width, self.height = self.size = tuple(size)
+        # Create array of cell colors.
+        self.color_array = np.zeros((*self.size, 3), np.uint8)
+        # Whether the layer is shown. Toggling this costs nothing until the next composite.
+        self.enabled = enabled
+        # Variables for updating.
+        self.points = set()
+        self.flip = True
+        # Whether the image was scrolled since the last update.
+        self.scrolled = False
+        # Create the render surface.
+        self.change_font(font)
+
+    def change_font(self, font: Font):
+        """Change the cell size of the layer to match a font."""
+        self.font = font
+        self.pixel_size = self.width * font.pixel_width, self.height * font.pixel_height
+        self.image = pg.Surface(self.pixel_size).convert()
+        # Black cells let the layers beneath show through.
+        self.image.set_colorkey((0, 0, 0))
+        # Draw all cells to the render surface on next update call.
+        self.flip = True
+
+    def cell_in_bounds(self, coordinates: Sequence[int]):
+        return 0 <= coordinates[0] < self.width and 0 <= coordinates[1] < self.height
+
+    def draw_cell(self, point: tuple[int, int], color: Union[Sequence[int], pg.Color]):
+        """Sets the color of a single cell. Only cells that actually change are redrawn."""
+        if self.cell_in_bounds(point) and (self.color_array[point] != color).any():
+            self.color_array[point] = color
+            self.points.add(point)
+
+    def scroll(self, dx: int, dy: int):
+        """Move every cell by dx and dy cells, on the image too. The cells scrolled in are made black,
+        so only the ones that aren't black have to be drawn again."""
+        if abs(dx) >= self.width or abs(dy) >= self.height:
+            self.fill_array(0)
+            return
+        dst, src = scroll_slices(self.size, dx, dy)
+        self.color_array[dst] = self.color_array[src]
+        # Move the points waiting to be drawn along with their cells.
+        self.points = {(x + dx, y + dy) for x, y in self.points if self.cell_in_bounds((x + dx, y + dy))}
+        # Move the drawn cells and blacken the ones scrolled in.
+        if not self.flip:
+            self.image.scroll(dx * self.font.pixel_width, dy * self.font.pixel_height)
+        for x, y, w, h in scroll_rects(self.size, dx, dy):
+            self.color_array[x:x + w, y:y + h] = 0
+            self.image.fill((0, 0, 0), (x * self.font.pixel_width, y * self.font.pixel_height,
+                                        w * self.font.pixel_width, h * self.font.pixel_height))
+        self.scrolled = True
+
+    def fill_array(self, colors: np.ndarray):
+        """Replaces the colors of every cell with a (width, height, 3) array at once."""
+        self.color_array[...] = colors
+        self.flip = True
+
+    def update(self) -> bool:
+        """Render the changed cells on the layer image. Returns True if anything was drawn."""
+        if self.flip:
+            # Scale a one pixel per cell image up to the cell size in a single call.
+            self.image.blit(pg.transform.scale(pg.surfarray.make_surface(self.color_array), self.pixel_size), (0, 0))
+        elif self.points:
+            for p in self.points:
+                self.image.fill(self.color_array[p], (p[0] * self.font.pixel_width, p[1] * self.font.pixel_height,
+                                                      *self.font.pixel_size))
+        elif not self.scrolled:
+            return False
+        # Clear the update variables.
+        self.points = set()
+        self.flip = False
+        self.scrolled = False
+        return True
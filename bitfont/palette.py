@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""Contains the Palette class for storing cell colors as small integer indices."""
+
+from typing import Sequence, Union
+
+import numpy as np
+import pygame as pg
+
+# Most colors a Palette can hold, so indices fit in a uint8.
+MAX_COLORS = 256
+
+
+class Palette:
+    """Table of up to 256 RGB colors, shared by Surfaces in palette mode.
+    Colors are added the first time they are used, so a palette fills itself as cells are drawn.
+    Once it is full, new colors are drawn with the closest color it holds."""
+
+    def __init__(self, colors: Sequence[Sequence[int]] = ((0, 0, 0), (255, 255, 255))):
+        """Given a sequence of RGB colors, returns a Palette holding them in order.
+        The default palette starts with black at index 0 and white at index 1."""
+        # Array of the RGB colors, indexed by palette index.
+        self.colors = np.zeros((MAX_COLORS, 3), np.uint8)
+        # Quick lookup of palette index based on color.
+        self.lookup: dict[tuple[int, int, int], int] = {}
+        self.count = 0
+        for color in colors:
+            self.add(color)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, color: Union[Sequence[int], pg.Color]) -> int:
+        """Add a color to the palette, even if it already holds it, and return its index.
+        Raises ValueError if the palette is full."""
+        if self.count >= MAX_COLORS:
+            raise ValueError(f"Palette is full, it holds at most {MAX_COLORS} colors.")
+        color = tuple(int(channel) for channel in color[:3])
+        index = self.count
+        self.colors[index] = color
+        # The first index of a color is the one used for it.
+        self.lookup.setdefault(color, index)
+        self.count += 1
+        return index
+
+    def index(self, color: Union[Sequence[int], pg.Color]) -> int:
+        """Given an RGB color, returns its palette index, adding it if it is new.
+        If the palette is full, returns the index of the closest color instead."""
+        color = tuple(int(channel) for channel in color[:3])
+        index = self.lookup.get(color, None)
+        if index is not None:
+            return index
+        if self.count < MAX_COLORS:
+            return self.add(color)
+        # Remember the closest color, so it is only searched for once.
+        index = self.nearest(color)
+        self.lookup[color] = index
+        return index
+
+    def nearest(self, color: Sequence[int]) -> int:
+        """Given an RGB color, returns the index of the closest color in the palette."""
+        distances = ((self.colors[:self.count].astype(np.int32) - color[:3]) ** 2).sum(axis=1)
+        return int(distances.argmin())
+
+    def indices(self, colors: np.ndarray) -> np.ndarray:
+        """Given an array of RGB colors with shape (..., 3), returns a uint8 array of their palette indices.
+        Each distinct color is only looked up once."""
+        unique, inverse = np.unique(colors.reshape(-1, 3), axis=0, return_inverse=True)
+        table = np.array([self.index(color) for color in unique.tolist()], np.uint8)
+        return table[inverse.reshape(-1)].reshape(colors.shape[:-1])
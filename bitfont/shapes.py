@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Contains the ShapeCache class for drawing shapes from cached templates that are moved into place."""
+
+import math
+from collections import OrderedDict
+from typing import Callable, Iterable, Sequence
+
+import numpy as np
+
+from .draw import draw_circle, draw_ellipse, circle_pie, ellipse_pie, draw_rect
+
+# Most templates a ShapeCache keeps by default before it evicts the least recently used one.
+MAX_TEMPLATES = 256
+# Templates are made around this whole cell, so all of their points have positive coordinates and
+# the shape functions round them the same way they do wherever the shape is drawn.
+TEMPLATE_ORIGIN = 1024
+
+
+class ShapeCache:
+    """Least recently used cache of shape templates, for shapes that are drawn again and again in new places.
+    A template holds the offsets of the points of a shape from the whole part of its center. Templates are keyed
+    by the shape parameters and the fractional part of the center, so moving a shape by whole cells only adds
+    the new position to the offsets. The shapes are the same as the ones the draw functions return, except for
+    pies centered at negative coordinates, which the draw functions round differently."""
+
+    def __init__(self, max_templates: int = MAX_TEMPLATES):
+        """Returns an empty ShapeCache holding at most max_templates templates."""
+        if max_templates < 1:
+            raise ValueError("A ShapeCache must hold at least one template.")
+        self.max_templates = max_templates
+        # Arrays of point offsets, ordered from least to most recently used.
+        self.templates: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        # Statistics of the cache lookups.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.templates)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups that found their template, 0 before any lookups."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Forget all templates. The statistics are kept."""
+        self.templates.clear()
+
+    def template(self, key: tuple, make: Callable[[], Iterable[tuple[int, int]]],
+                 origin: tuple[int, int] = (0, 0)) -> np.ndarray:
+        """Returns the (N, 2) array of offsets stored under key, sorted and read only.
+        On a miss, the template is made from the points returned by make, relative to origin."""
+        offsets = self.templates.get(key, None)
+        if offsets is not None:
+            self.hits += 1
+            self.templates.move_to_end(key)
+            return offsets
+        self.misses += 1
+        # Sort the points so a template always lists them in the same order.
+        offsets = np.array(sorted(make()), np.int64).reshape(-1, 2) - origin
+        offsets.flags.writeable = False
+        self.templates[key] = offsets
+        # Evict the least recently used template when full.
+        if len(self.templates) > self.max_templates:
+            self.templates.popitem(last=False)
+            self.evictions += 1
+        return offsets
+
+    def _centered(self, function: Callable, center: Sequence[float], *args) -> np.ndarray:
+        """Returns the points of function(center, *args) as an (N, 2) array, made from a template."""
+        base = math.floor(center[0]), math.floor(center[1])
+        fraction = center[0] - base[0], center[1] - base[1]
+        origin = TEMPLATE_ORIGIN + fraction[0], TEMPLATE_ORIGIN + fraction[1]
+        offsets = self.template((function.__name__, fraction, *args), lambda: function(origin, *args),
+                                (TEMPLATE_ORIGIN, TEMPLATE_ORIGIN))
+        return offsets + base
+
+    def circle(self, center: Sequence[float], radius: float, width: int = 0) -> np.ndarray:
+        """Returns the points of draw_circle as an (N, 2) array."""
+        return self._centered(draw_circle, center, radius, width)
+
+    def ellipse(self, center: Sequence[float], rx: float, ry: float, width: int = 0) -> np.ndarray:
+        """Returns the points of draw_ellipse as an (N, 2) array."""
+        return self._centered(draw_ellipse, center, rx, ry, width)
+
+    def circle_pie(self, center: Sequence[float], radius: float, start_angle: float, stop_angle: float,
+                   width: int = 0) -> np.ndarray:
+        """Returns the points of circle_pie as an (N, 2) array."""
+        return self._centered(circle_pie, center, radius, start_angle, stop_angle, width)
+
+    def ellipse_pie(self, center: Sequence[float], rx: float, ry: float, start_angle: float, stop_angle: float,
+                    width: int = 0) -> np.ndarray:
+        """Returns the points of ellipse_pie as an (N, 2) array."""
+        return self._centered(ellipse_pie, center, rx, ry, start_angle, stop_angle, width)
+
+    def rect(self, rect: Sequence[int], filled: bool = True) -> np.ndarray:
+        """Returns the points of draw_rect as an (N, 2) array. The rect must be whole (x, y, w, h)."""
+        x, y, w, h = rect
+        offsets = self.template(("draw_rect", w, h, filled), lambda: draw_rect((0, 0, w, h), filled))
+        return offsets + (x, y)
+
+    @staticmethod
+    def to_set(points: np.ndarray) -> set[tuple[int, int]]:
+        """Given an (N, 2) array of points, returns them as a set of tuples like the draw functions."""
+        return set(map(tuple, points.tolist()))
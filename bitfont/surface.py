@@ -7,19 +7,28 @@ from typing import Union, Sequence
 import numpy as np
 import pygame as pg
 
+from .functions import scroll_slices, scroll_rects
 # For type hints only.
 from .font import Font
+from .layer import ColorLayer
+from .palette import Palette
 
 # Cell type for type hints. A cell is a tuple of tile, fg, bg, but any of its elements may be None.
-CellType = tuple[Union[int, None], Union[Sequence[int], pg.Color, None], Union[Sequence[int], pg.Color, None]]
+# Surfaces in palette mode also take palette indices for fg and bg.
+CellType = tuple[Union[int, None], Union[Sequence[int], pg.Color, int, None], Union[Sequence[int], pg.Color, int, None]]
+
+# Most colored glyphs a PygameSurface keeps before starting its cache over.
+GLYPH_CACHE_SIZE = 4096
 
 
 class Surface:
     """Class for representing a rectangular area of cells."""
 
-    def __init__(self, size: Sequence[int]):
+    def __init__(self, size: Sequence[int], palette: Palette = None):
         """Given a size, returns a Surface object filled with default cells.
-        The default cell has ID 0, foreground white, and background black."""
+        The default cell has ID 0, foreground white, and background black.
+        Given a palette, the Surface is in palette mode, and the fg and bg arrays hold (width, height)
+        palette indices instead of (width, height, 3) RGB colors. Cells are still drawn with RGB colors."""
         # Raise ValueError on invalid size argument.
         if len(size) != 2:
             raise ValueError("Size must be of length two; (width, height).")
@@ -27,17 +36,22 @@ class Surface:
         self.width, self.height = self.size = size
         self.rect = pg.Rect(0, 0, *self.size)
         # Create arrays of cell attributes.
+        self.palette = palette
         self.tile_array = np.full(self.size, 0, np.uint8)
-        self.fg_array = np.full((*self.size, 3), 255, np.uint8)
-        self.bg_array = np.full((*self.size, 3), 0, np.uint8)
+        if palette is None:
+            self.fg_array = np.full((*self.size, 3), 255, np.uint8)
+            self.bg_array = np.full((*self.size, 3), 0, np.uint8)
+        else:
+            self.fg_array = np.full(self.size, palette.index((255, 255, 255)), np.uint8)
+            self.bg_array = np.full(self.size, palette.index((0, 0, 0)), np.uint8)
         # Variables for updating, needed for PygameSurface.
         self.points = set()
         self.flip = False
 
     def copy(self):
         """Returns a Surface copy of self."""
-        # Create the copy.
-        copy_surface = Surface(self.size)
+        # Create the copy, sharing the palette.
+        copy_surface = Surface(self.size, self.palette)
         # Copy the arrays.
         copy_surface.tile_array = self.tile_array.copy()
         copy_surface.fg_array = self.fg_array.copy()
@@ -45,6 +59,37 @@ class Surface:
         # Return the copied surface.
         return copy_surface
 
+    def encode_color(self, color: Union[Sequence[int], pg.Color]) -> Union[Sequence[int], pg.Color, int]:
+        """Given an RGB color, returns it as stored in the fg and bg arrays, which is a palette index in
+        palette mode. In palette mode, a color may also be given as a palette index."""
+        if self.palette is None or isinstance(color, (int, np.integer)):
+            return color
+        return self.palette.index(color)
+
+    def colors_from(self, source, colors: np.ndarray) -> np.ndarray:
+        """Given colors from the fg or bg array of a source Surface, returns them as stored by this Surface."""
+        if source.palette is self.palette:
+            return colors
+        if source.palette is not None:
+            colors = source.palette.colors[colors]
+        return colors if self.palette is None else self.palette.indices(colors)
+
+    def fg_rgb(self) -> np.ndarray:
+        """Returns a (width, height, 3) array of the RGB foreground colors, whether in palette mode or not.
+        Outside palette mode this is the fg array itself, so it must not be changed."""
+        return self.fg_array if self.palette is None else self.palette.colors[self.fg_array]
+
+    def bg_rgb(self) -> np.ndarray:
+        """Returns a (width, height, 3) array of the RGB background colors, whether in palette mode or not.
+        Outside palette mode this is the bg array itself, so it must not be changed."""
+        return self.bg_array if self.palette is None else self.palette.colors[self.bg_array]
+
+    @staticmethod
+    def pack(tiles: np.ndarray, fg: np.ndarray, bg: np.ndarray) -> np.ndarray:
+        """Given tiles and fg and bg palette indices, returns them packed into one uint32 per cell,
+        so cells can be compared with a single integer compare."""
+        return tiles.astype(np.uint32) | fg.astype(np.uint32) << 8 | bg.astype(np.uint32) << 16
+
     @staticmethod
     def bound_rect(surf, rect: Sequence[int] = None) -> Sequence[int]:
         """Given a Surface and a rect, converts rect into a rect for slicing on the Surface."""
@@ -70,6 +115,25 @@ class Surface:
     def cell_in_bounds(self, coordinates: Sequence[int]):
         return 0 <= coordinates[0] < self.width and 0 <= coordinates[1] < self.height
 
+    def scroll(self, dx: int, dy: int) -> list[tuple[int, int, int, int]]:
+        """Move every cell by dx and dy cells. Cells moved off the Surface are lost, and the cells scrolled in
+        are filled with the default cell. Returns the rects (x, y, w, h) of the cells scrolled in,
+        which is the whole Surface if the scroll is as big as the Surface."""
+        if abs(dx) >= self.width or abs(dy) >= self.height:
+            self.fill((0, (255, 255, 255), (0, 0, 0)))
+            return [(0, 0, *self.size)]
+        dst, src = scroll_slices(self.size, dx, dy)
+        # Move the cells that stay, NumPy handles the overlap.
+        for array in (self.tile_array, self.fg_array, self.bg_array):
+            array[dst] = array[src]
+        # Move the points waiting to be drawn along with their cells.
+        self.points = {(x + dx, y + dy) for x, y in self.points if self.cell_in_bounds((x + dx, y + dy))}
+        # Fill the cells scrolled in.
+        rects = scroll_rects(self.size, dx, dy)
+        for rect in rects:
+            self.fill((0, (255, 255, 255), (0, 0, 0)), rect)
+        return rects
+
     def fill(self, cell: CellType, rect: Sequence[int] = None):
         """Fills the Surface with a given cell. The rect argument limits the fill to a given area."""
         # Don't bother doing anything if we aren't drawing anything.
@@ -81,11 +145,11 @@ class Surface:
         if cell[0] is not None:
             self.tile_array[rect[0]:rect[2], rect[1]:rect[3]] = cell[0]
         if cell[1] is not None:
-            self.fg_array[rect[0]:rect[2], rect[1]:rect[3]] = cell[1]
+            self.fg_array[rect[0]:rect[2], rect[1]:rect[3]] = self.encode_color(cell[1])
         if cell[2] is not None:
-            self.bg_array[rect[0]:rect[2], rect[1]:rect[3]] = cell[2]
+            self.bg_array[rect[0]:rect[2], rect[1]:rect[3]] = self.encode_color(cell[2])
         # Update the Surface.
-        for w, h in np.ndindex((rect[2], rect[3])):
+        for w, h in np.ndindex((rect[2] - rect[0], rect[3] - rect[1])):
             self.points.add((rect[0] + w, rect[1] + h))
 
     def blit(self, source, pos: Sequence[int], rect: Sequence[int] = None,
@@ -115,10 +179,10 @@ class Surface:
                 source.tile_array[rect[0]:rect[2], rect[1]:rect[3]]
         if apply[1]:
             self.fg_array[source_rect[0]:source_rect[2], source_rect[1]:source_rect[3]] = \
-                source.fg_array[rect[0]:rect[2], rect[1]:rect[3]]
+                self.colors_from(source, source.fg_array[rect[0]:rect[2], rect[1]:rect[3]])
         if apply[2]:
             self.bg_array[source_rect[0]:source_rect[2], source_rect[1]:source_rect[3]] = \
-                source.bg_array[rect[0]:rect[2], rect[1]:rect[3]]
+                self.colors_from(source, source.bg_array[rect[0]:rect[2], rect[1]:rect[3]])
         # Update the surface.
         for w, h in np.ndindex((source_rect[2], source_rect[3])):
             if self.cell_in_bounds((source_rect[0] + w, source_rect[1] + h)):
@@ -156,9 +220,9 @@ class Surface:
                 if apply[0]:
                     self.tile_array[dest_cell] = source.tile_array[source_cell]
                 if apply[1]:
-                    self.fg_array[dest_cell] = source.fg_array[source_cell]
+                    self.fg_array[dest_cell] = self.colors_from(source, source.fg_array[source_cell])
                 if apply[2]:
-                    self.bg_array[dest_cell] = source.bg_array[source_cell]
+                    self.bg_array[dest_cell] = self.colors_from(source, source.bg_array[source_cell])
                 # Update the points.
                 self.points.add(dest_cell)
         # Return the area of affected cells.
@@ -173,9 +237,9 @@ class Surface:
             if cell[0] is not None:
                 self.tile_array[point] = cell[0]
             if cell[1] is not None:
-                self.fg_array[point] = cell[1]
+                self.fg_array[point] = self.encode_color(cell[1])
             if cell[2] is not None:
-                self.bg_array[point] = cell[2]
+                self.bg_array[point] = self.encode_color(cell[2])
             # Update the surface.
             self.points.add(point)
 
@@ -212,24 +276,41 @@ class Surface:
 class PygameSurface(Surface):
     """Child class of Surface that actually renders its cells to a pygame surface."""
 
-    def __init__(self, size: Sequence[int], font: Font):
+    def __init__(self, size: Sequence[int], font: Font, palette: Palette = None, indexed: bool = False):
         """Given a size and a font object, returns a PygameSurface object filled with default cells.
         The default cell has ID 0, foreground white, and background black.
+        Given a palette, the PygameSurface is in palette mode, see Surface.
+        When indexed is True, which needs a palette, the cells are rendered as palette indices into an 8 bit
+        image. All changed cells are then drawn at once with NumPy, and set_palette recolors the whole image
+        without redrawing any cells. The font must have one color.
         The main pygame display surface must already be created with pygame.display.set_mode."""
+        if indexed and palette is None:
+            raise ValueError("An indexed PygameSurface needs a palette.")
         # Initialize parent class.
-        super().__init__(size)
-        # Create buffer arrays.
-        self.tile_buffer = self.tile_array.copy()
-        self.fg_buffer = self.fg_array.copy()
-        self.bg_buffer = self.bg_array.copy()
+        super().__init__(size, palette)
+        self.indexed = indexed
+        # The colors the 8 bit image is shown with, None to show the palette colors as they are.
+        self.display_colors: Union[np.ndarray, None] = None
+        # Whether the 8 bit image colors changed since the last composite.
+        self.palette_changed = False
+        # Create buffer arrays of the cells last drawn. In palette mode a single packed array is enough.
+        # Cells scrolled in, which have to be drawn even if they match the buffers.
+        self.exposed = np.zeros(self.size, np.bool_)
+        self.tile_buffer = self.fg_buffer = self.bg_buffer = self.packed_buffer = None
+        self._store_buffers()
+        # Colored glyphs, keyed by tile and foreground color, or palette index in palette mode.
+        self.glyphs: dict[tuple, pg.Surface] = {}
         # Get font and size attributes.
         self.font = font
         self.pixel_width, self.pixel_height = self.width * self.font.pixel_width, self.height * self.font.pixel_height
         self.pixel_size = self.pixel_width, self.pixel_height
         # Create main render surface.
-        self.image = pg.Surface(self.pixel_size).convert()
+        self.image = self._create_image()
         # Draw all cells to the main render surface on next update call.
         self.flip = True
+        # Color layers composited beneath the cells, and which of them were shown last composite.
+        self.layers: list[ColorLayer] = []
+        self.composited_layers = None
 
     def change_font(self, font: Font):
         """Change the font of the PygameSurface, but keep its cell dimensions the same."""
@@ -238,16 +319,58 @@ class PygameSurface(Surface):
         self.pixel_width, self.pixel_height = self.width * self.font.pixel_width, self.height * self.font.pixel_height
         self.pixel_size = self.pixel_width, self.pixel_height
         # Create main render surface.
-        self.image = pg.Surface(self.pixel_size).convert()
+        self.image = self._create_image()
         # Draw all cells to the main render surface on next update call.
         self.flip = True
+        # Forget the glyphs of the old font.
+        self.glyphs = {}
+        # Resize the layers to the new cells.
+        for layer in self.layers:
+            layer.change_font(font)
+        self.composited_layers = None
+
+    def _create_image(self) -> pg.Surface:
+        """Returns a new render surface the pixel size of the PygameSurface."""
+        if not self.indexed:
+            return pg.Surface(self.pixel_size).convert()
+        image = pg.Surface(self.pixel_size, depth=8)
+        # Show the colors on the new image on the next update.
+        self.palette_count = -1
+        return image
+
+    def set_palette(self, colors: np.ndarray = None):
+        """Show the 8 bit image of an indexed PygameSurface with the given (256, 3) colors instead of the
+        palette colors, or the palette colors again if None. No cells are redrawn, so this is cheap enough
+        to call every frame."""
+        if not self.indexed:
+            raise ValueError("Only an indexed PygameSurface has a palette to set.")
+        if colors is None and self.display_colors is None:
+            return
+        if colors is not None and self.display_colors is not None and np.array_equal(colors, self.display_colors):
+            return
+        self.display_colors = None if colors is None else np.array(colors, np.uint8)
+        self._show_colors()
+
+    def _show_colors(self):
+        """Give the 8 bit image the display colors, or the palette colors."""
+        colors = self.palette.colors if self.display_colors is None else self.display_colors
+        self.image.set_palette(colors.tolist())
+        self.palette_count = len(self.palette)
+        self.palette_changed = True
+
+    def add_layer(self, layer: ColorLayer):
+        """Add a color layer beneath the cells, above any layers added before it.
+        Once a surface has layers, update renders the cells on its own image and composites the
+        image and layers onto the given surface."""
+        self.layers.append(layer)
+        self.composited_layers = None
 
     @staticmethod
-    def refactor_size(size: tuple[int, int], font: Font):
+    def refactor_size(size: tuple[int, int], font: Font, palette: Palette = None, indexed: bool = False):
         """Returns a new PygameSurface that will fit inside the given pixel dimensions."""
         w = size[0] // font.pixel_width
         h = size[1] // font.pixel_height
-        return PygameSurface((w, h), font)
+        return PygameSurface((w, h), font, palette, indexed)
 
     def get_pixel_pos(self, pos: tuple[int, int], clamp: bool = True):
         """Given cell coordinates, translate to the top left pixel coordinates of that cell.
@@ -287,42 +410,188 @@ class PygameSurface(Surface):
         # Return that cell.
         return x, y
 
+    def scroll(self, dx: int, dy: int, surf: pg.Surface = None) -> list[tuple[int, int, int, int]]:
+        """Move every cell by dx and dy cells, see Surface.scroll. The rendered cells are moved on the given surface,
+        defaults to its own surface, along with the buffers and the layers. Only the cells scrolled in are drawn
+        on the next update, so scrolling costs as much as the edge instead of the whole surface.
+        Use the surface the cells are drawn on by update, which is its own surface when it has layers or is indexed."""
+        rects = super().scroll(dx, dy)
+        for layer in self.layers:
+            layer.scroll(dx, dy)
+        # Everything gets drawn anyway on a flip or a scroll as big as the surface.
+        if self.flip or rects == [(0, 0, *self.size)]:
+            self.flip = True
+            return rects
+        if surf is None:
+            surf = self.image
+        # Move the buffers along with the cells.
+        dst, src = scroll_slices(self.size, dx, dy)
+        buffers = (self.tile_buffer, self.fg_buffer, self.bg_buffer) if self.palette is None else (self.packed_buffer,)
+        for array in (*buffers, self.exposed):
+            array[dst] = array[src]
+        # Move the drawn cells, leaving the old pixels in the cells scrolled in.
+        surf.scroll(dx * self.font.pixel_width, dy * self.font.pixel_height)
+        # Make sure the cells scrolled in get drawn.
+        for x, y, w, h in rects:
+            self.exposed[x:x + w, y:y + h] = True
+        return rects
+
+    def _glyph(self, tile: int, key, color: Sequence[int]) -> pg.Surface:
+        """Returns the tile image colored with the foreground color, cached under the key."""
+        glyph = self.glyphs.get((tile, key), None)
+        if glyph is None:
+            # Start over when full, since the colors in use are usually far fewer than the limit.
+            if len(self.glyphs) >= GLYPH_CACHE_SIZE:
+                self.glyphs = {}
+            # Load in tile image from the Font.
+            glyph = self.font.get_tile(tile)
+            # Color in the image with the foreground color.
+            glyph.fill(color, None, pg.BLEND_RGB_MULT)
+            # Set the key color to black for transparency.
+            glyph.set_colorkey((0, 0, 0))
+            self.glyphs[tile, key] = glyph
+        return glyph
+
     def _draw_cell(self, pos: Sequence[int], surf: pg.Surface = None):
         """Given a cell position, draws tile in correct colors on given surface."""
         # Default to drawing on own surface.
         if surf is None:
             surf = self.image
+        # Look up the colors, keying the glyph on the small palette index when there is one.
+        if self.palette is None:
+            fg = self.fg_array[pos]
+            key = tuple(fg.tolist())
+            bg = self.bg_array[pos]
+        else:
+            key = int(self.fg_array[pos])
+            fg = self.palette.colors[key]
+            bg = self.palette.colors[self.bg_array[pos]]
         # Fill the cell with the background color.
-        surf.fill(self.bg_array[pos], (pos[0] * self.font.pixel_width, pos[1] * self.font.pixel_height,
-                                       *self.font.pixel_size))
-        # Load in tile image from the Font.
-        fg_surf = self.font.get_tile(self.tile_array[pos])
-        # Color in the image with the foreground color.
-        fg_surf.fill(self.fg_array[pos], None, pg.BLEND_RGB_MULT)
-        # Set the key color to black for transparency.
-        fg_surf.set_colorkey((0, 0, 0))
+        surf.fill(bg, (pos[0] * self.font.pixel_width, pos[1] * self.font.pixel_height, *self.font.pixel_size))
         # Blit foreground onto cell on image.
-        surf.blit(fg_surf, (pos[0] * self.font.pixel_width, pos[1] * self.font.pixel_height))
+        surf.blit(self._glyph(int(self.tile_array[pos]), key, fg),
+                  (pos[0] * self.font.pixel_width, pos[1] * self.font.pixel_height))
 
-    def update(self, surf: pg.Surface = None):
-        """Actually render the cells on the given surface, defaults to its own surface."""
+    def _store_buffers(self):
+        """Copy every cell into the buffer arrays."""
+        # Every cell gets drawn, scrolled in or not.
+        self.exposed[...] = False
+        if self.palette is None:
+            self.tile_buffer = self.tile_array.copy()
+            self.fg_buffer = self.fg_array.copy()
+            self.bg_buffer = self.bg_array.copy()
+        else:
+            self.packed_buffer = self.pack(self.tile_array, self.fg_array, self.bg_array)
+
+    def _changed_points(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the x and y arrays of the points in bounds that differ from the buffers,
+        and updates the buffers at those points."""
+        xs, ys = np.array(list(self.points), np.intp).reshape(-1, 2).T
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        xs, ys = xs[inside], ys[inside]
+        tiles = self.tile_array[xs, ys]
+        if self.palette is None:
+            fg, bg = self.fg_array[xs, ys], self.bg_array[xs, ys]
+            changed = ((tiles != self.tile_buffer[xs, ys]) | (fg != self.fg_buffer[xs, ys]).any(1) |
+                       (bg != self.bg_buffer[xs, ys]).any(1))
+            self.tile_buffer[xs, ys], self.fg_buffer[xs, ys], self.bg_buffer[xs, ys] = tiles, fg, bg
+        else:
+            # A single integer compare per cell.
+            packed = self.pack(tiles, self.fg_array[xs, ys], self.bg_array[xs, ys])
+            changed = packed != self.packed_buffer[xs, ys]
+            self.packed_buffer[xs, ys] = packed
+        # Cells scrolled in are always drawn.
+        changed |= self.exposed[xs, ys]
+        self.exposed[xs, ys] = False
+        return xs[changed], ys[changed]
+
+    def _draw_indexed(self, xs: np.ndarray, ys: np.ndarray):
+        """Draw the cells at the given x and y arrays on the 8 bit image, all at once."""
+        tiles = self.tile_array[xs, ys]
+        fg, bg = self.fg_array[xs, ys], self.bg_array[xs, ys]
+        # Black foreground pixels are see through, so they show the background.
+        fg = np.where(self.palette.colors[fg].any(1), fg, bg)
+        # Make the pixel blocks of every cell from the tile masks.
+        blocks = np.where(self.font.get_masks()[tiles], fg[:, None, None], bg[:, None, None])
+        # Write the blocks into the image through a view split into cells.
+        pixels = pg.surfarray.pixels2d(self.image)
+        cells = pixels.reshape(self.width, self.font.pixel_width, self.height, self.font.pixel_height)
+        cells.transpose(0, 2, 1, 3)[xs, ys] = blocks
+        # Unlock the image.
+        del pixels, cells
+
+    def _render_indexed(self) -> bool:
+        """Draw the changed cells on the 8 bit image. Returns True if any cells were drawn."""
+        # Show the colors added to the palette since the image was last colored.
+        if self.display_colors is None and self.palette_count != len(self.palette):
+            self._show_colors()
+        if self.flip:
+            xs, ys = np.indices(self.size).reshape(2, -1)
+            self._store_buffers()
+        elif self.points:
+            xs, ys = self._changed_points()
+        else:
+            return False
+        if len(xs):
+            self._draw_indexed(xs, ys)
+        # Clear the update variables through super().
+        super().update()
+        return len(xs) > 0
+
+    def render(self, surf: pg.Surface = None) -> bool:
+        """Draw the changed cells on the given surface, defaults to its own surface.
+        An indexed PygameSurface always draws on its own 8 bit image.
+        Returns True if any cells were drawn."""
+        if self.indexed:
+            return self._render_indexed()
+        drawn = False
         # Actually draw the required cells.
         if self.flip:
             # Redraw the whole surface.
             for x, y in np.ndindex(self.size):
                 self._draw_cell((x, y), surf)
+            drawn = True
+            # Update buffer arrays.
+            self._store_buffers()
         elif self.points:
-            # Redraw only the points that have changed.
-            for p in self.points:
-                if not (self.tile_buffer[p] == self.tile_array[p] and
-                        (self.bg_buffer[p] == self.bg_array[p]).all() and
-                        (self.fg_buffer[p] == self.fg_array[p]).all()):
-                    self._draw_cell(p, surf)
-        # Only bother updating buffers and clearing data if cells have changed.
+            # Redraw only the points that have changed, comparing them all at once.
+            xs, ys = self._changed_points()
+            for p in zip(xs.tolist(), ys.tolist()):
+                self._draw_cell(p, surf)
+            drawn = len(xs) > 0
+        # Only bother clearing data if cells have changed.
         if self.flip or self.points:
-            # Update buffer arrays.
-            self.tile_buffer = self.tile_array.copy()
-            self.fg_buffer = self.fg_array.copy()
-            self.bg_buffer = self.bg_array.copy()
             # Clear the update variables through super().
             super().update()
+        return drawn
+
+    def composite(self, surf: pg.Surface):
+        """Blit the shown layers and then the cells onto the given surface."""
+        shown = [layer for layer in self.layers if layer.enabled]
+        # Show the layers through the black pixels of the cells, starting from black.
+        if shown:
+            surf.fill((0, 0, 0), self.image.get_rect())
+        for layer in shown:
+            surf.blit(layer.image, (0, 0))
+        if self.indexed:
+            # The 8 bit image is keyed by the palette index of black.
+            self.image.set_colorkey(self.palette.index((0, 0, 0)) if shown else None)
+            self.palette_changed = False
+        else:
+            self.image.set_colorkey((0, 0, 0) if shown else None)
+        surf.blit(self.image, (0, 0))
+        # Remember what was shown to know when to composite again.
+        self.composited_layers = tuple(layer.enabled for layer in self.layers)
+
+    def update(self, surf: pg.Surface = None):
+        """Actually render the cells on the given surface, defaults to its own surface."""
+        # Without layers, draw straight on the surface.
+        if surf is None or surf is self.image or (not self.layers and not self.indexed):
+            self.render(surf)
+            return
+        # Otherwise, render the cells and layers on their own images and composite them when needed.
+        changed = self.render(self.image) or self.palette_changed
+        for layer in self.layers:
+            changed = layer.update() and layer.enabled or changed
+        if changed or self.composited_layers != tuple(layer.enabled for layer in self.layers):
+            self.composite(surf)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+"""Contains classes for rendering Surfaces to an ANSI terminal and reading keys from it."""
+
+import os
+import re
+import select
+import sys
+import threading
+from typing import TextIO, Union
+
+import numpy as np
+import pygame as pg
+
+# For type hints only.
+from .surface import Surface
+
+# Terminal key input only works where termios exists.
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = tty = None
+
+# Unicode characters of every CP437 code, as drawn by the CP437 fonts.
+CP437_CHARS = (" ☺☻♥♦♣♠•◘○◙♂♀♪♫☼►◄↕‼¶§▬↨↑↓→←∟↔▲▼"
+               + bytes(range(32, 127)).decode("ascii") + "⌂"
+               + bytes(range(128, 256)).decode("cp437"))
+# Codes whose glyphs have no foreground pixels, so their foreground color never has to be sent.
+BLANK_TILES = frozenset((0, 32, 255))
+
+# Escape sequences for entering and leaving the full screen mode of the terminal.
+ENTER_SCREEN = "\x1b[?1049h\x1b[?25l\x1b[0m\x1b[2J"
+LEAVE_SCREEN = "\x1b[0m\x1b[?25h\x1b[?1049l"
+
+# Escape sequences sent by special keys, and the pygame keys they stand for.
+ESCAPE_KEYS = {
+    "A": pg.K_UP, "B": pg.K_DOWN, "C": pg.K_RIGHT, "D": pg.K_LEFT,
+    "P": pg.K_F1, "Q": pg.K_F2, "R": pg.K_F3, "S": pg.K_F4,
+    "11~": pg.K_F1, "12~": pg.K_F2, "13~": pg.K_F3, "14~": pg.K_F4, "15~": pg.K_F5,
+}
+# Single characters of special keys.
+CHARACTER_KEYS = {" ": pg.K_SPACE, "\r": pg.K_RETURN, "\n": pg.K_RETURN, "\t": pg.K_TAB,
+                  "\x7f": pg.K_BACKSPACE, "\x1b": pg.K_ESCAPE}
+# Splits terminal input into escape sequences and single characters.
+INPUT_PATTERN = re.compile(r"\x1b\[([0-9;]*)([A-Za-z~])|\x1bO([A-Z])|(.)", re.DOTALL)
+
+
+class TerminalRenderer:
+    """Class for drawing a Surface on a 24 bit color ANSI terminal, one character per cell.
+    Only the cells that changed since the last render are sent, with as few escape sequences as possible."""
+
+    def __init__(self, surface: Surface, stream: TextIO = None, origin: tuple[int, int] = (0, 0)):
+        """Given a Surface, returns a TerminalRenderer drawing it on stream, defaults to standard output.
+        The origin is the terminal cell the top left corner of the Surface is drawn at."""
+        self.surface = surface
+        self.stream = sys.stdout if stream is None else stream
+        self.origin = origin
+        # Copies of the cells on the terminal, None to draw every cell on the next render.
+        self.tile_buffer: Union[np.ndarray, None] = None
+        self.fg_buffer: Union[np.ndarray, None] = None
+        self.bg_buffer: Union[np.ndarray, None] = None
+        # Number of characters sent to the terminal so far.
+        self.written = 0
+
+    def start(self):
+        """Switch the terminal to a blank full screen and hide the cursor."""
+        self.stream.write(ENTER_SCREEN)
+        self.stream.flush()
+        self.redraw()
+
+    def close(self):
+        """Restore the terminal to how it was before start."""
+        self.stream.write(LEAVE_SCREEN)
+        self.stream.flush()
+
+    def redraw(self):
+        """Draw every cell on the next render, such as after the terminal was cleared or resized."""
+        self.tile_buffer = self.fg_buffer = self.bg_buffer = None
+
+    def changed_cells(self) -> np.ndarray:
+        """Returns a boolean array of the cells that differ from the terminal."""
+        surface = self.surface
+        if self.tile_buffer is None or self.tile_buffer.shape != surface.tile_array.shape:
+            return np.ones(surface.size, np.bool_)
+        # Compare the RGB colors, which works in palette mode too.
+        return ((surface.tile_array != self.tile_buffer) | (surface.fg_rgb() != self.fg_buffer).any(2) |
+                (surface.bg_rgb() != self.bg_buffer).any(2))
+
+    def render(self) -> int:
+        """Send the changed cells to the terminal. Returns the number of cells sent."""
+        surface = self.surface
+        # Find the changed cells in row by row order, the order the terminal cursor moves in.
+        ys, xs = np.nonzero(self.changed_cells().T)
+        if not len(xs):
+            return 0
+        tiles = surface.tile_array[xs, ys].tolist()
+        fg_rgb, bg_rgb = surface.fg_rgb(), surface.bg_rgb()
+        fgs = fg_rgb[xs, ys].tolist()
+        bgs = bg_rgb[xs, ys].tolist()
+        ox, oy = self.origin
+        # The colors are unknown to start, so reset them before the first cell.
+        parts = ["\x1b[0m"]
+        cursor = None
+        fg = bg = None
+        for x, y, tile, cell_fg, cell_bg in zip(xs.tolist(), ys.tolist(), tiles, fgs, bgs):
+            # Move the cursor if the cell isn't right after the last one.
+            if cursor != (x, y):
+                if cursor is not None and cursor[1] == y and x > cursor[0]:
+                    # Moving forward on the same row is shorter than moving to a position.
+                    parts.append(f"\x1b[{x - cursor[0]}C")
+                else:
+                    parts.append(f"\x1b[{oy + y + 1};{ox + x + 1}H")
+            # Only change the colors that differ, and skip the foreground of blank cells.
+            colors = []
+            if cell_fg != fg and tile not in BLANK_TILES:
+                colors.append("38;2;%d;%d;%d" % tuple(cell_fg))
+                fg = cell_fg
+            if cell_bg != bg:
+                colors.append("48;2;%d;%d;%d" % tuple(cell_bg))
+                bg = cell_bg
+            if colors:
+                parts.append(f"\x1b[{';'.join(colors)}m")
+            parts.append(CP437_CHARS[tile])
+            cursor = x + 1, y
+        # Send the whole frame in one write.
+        frame = "".join(parts)
+        self.stream.write(frame)
+        self.stream.flush()
+        self.written += len(frame)
+        # Remember what is on the terminal now.
+        self.tile_buffer = surface.tile_array.copy()
+        self.fg_buffer = fg_rgb.copy()
+        self.bg_buffer = bg_rgb.copy()
+        return len(xs)
+
+
+class TerminalInput:
+    """Class for reading keys typed in a terminal and posting them as pygame KEYDOWN events.
+    Letters post their lowercase key, with the shift modifier when typed in uppercase."""
+
+    def __init__(self, fd: int = None):
+        """Given a file descriptor, defaults to standard input, returns a TerminalInput for it."""
+        if termios is None:
+            raise RuntimeError("Terminal input needs the termios module.")
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.settings = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Stop the terminal from echoing and buffering keys, and start posting them as events."""
+        self.settings = termios.tcgetattr(self.fd)
+        tty.setcbreak(self.fd)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="terminal input", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stop reading keys and restore the terminal settings."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        if self.settings is not None:
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.settings)
+            self.settings = None
+
+    def _run(self):
+        """Read and post keys until closed."""
+        while self.running:
+            # Wake up now and then to check if closed.
+            if select.select([self.fd], [], [], 0.1)[0]:
+                for event in self.parse(os.read(self.fd, 1024).decode("utf8", "replace")):
+                    pg.event.post(event)
+
+    @staticmethod
+    def parse(text: str) -> list[pg.event.Event]:
+        """Returns the KEYDOWN events of the keys in a string of terminal input."""
+        events = []
+        for match in INPUT_PATTERN.finditer(text):
+            params, final, ss3, char = match.groups()
+            mod = pg.KMOD_NONE
+            if char is not None:
+                # Plain characters.
+                if char in CHARACTER_KEYS:
+                    key = CHARACTER_KEYS[char]
+                elif char.isalpha() and char.isascii():
+                    key = ord(char.lower())
+                    mod = pg.KMOD_SHIFT if char.isupper() else pg.KMOD_NONE
+                else:
+                    key = ord(char)
+            else:
+                # Escape sequences, where a second parameter of 2 means shift was held.
+                params = (params or "").split(";")
+                code = ss3 or (final if final != "~" else params[0] + "~")
+                if code not in ESCAPE_KEYS:
+                    continue
+                key = ESCAPE_KEYS[code]
+                if len(params) > 1 and params[1] == "2":
+                    mod = pg.KMOD_SHIFT
+            events.append(pg.event.Event(pg.KEYDOWN, key=key, mod=mod, unicode=char or ""))
+        return events
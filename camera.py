@@ -0,0 +1,72 @@
+"""This file holds the camera that shows part of a world bigger than the screen."""
+
+# Description:
+#   The following class Camera is used to pick the part of the world shown on the screen.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only asks it to follow a position and how far the
+#   view moved, not how the view is kept inside the world.
+#   This class uses encapsulation because it holds the view position along with the functions that
+#   translate between world and screen positions.
+
+# Cells between the followed position and the edge of the view before the view scrolls.
+FOLLOW_MARGIN = 8
+
+
+class Camera:
+    """A view of view_size cells into a world of world_size cells, which always stays inside the world."""
+    def __init__(self, world_size: tuple[int, int], view_size: tuple[int, int], margin: int = FOLLOW_MARGIN):
+        """Create a camera at the top left corner of the world. The world must be at least as big as the view."""
+        if world_size[0] < view_size[0] or world_size[1] < view_size[1]:
+            raise ValueError(f"The world {world_size} must be at least as big as the view {view_size}.")
+        self.world_size = world_size
+        self.view_size = view_size
+        # The margin can't be more than half the view, or the view could never settle.
+        self.margin = min(margin, (view_size[0] - 1) // 2, (view_size[1] - 1) // 2)
+        # The world position of the top left cell of the view.
+        self.x = self.y = 0
+
+    @property
+    def rect(self) -> tuple[int, int, int, int]:
+        """The rect (x, y, w, h) of the world shown."""
+        return self.x, self.y, *self.view_size
+
+    def clamp(self, x: int, y: int) -> tuple[int, int]:
+        """Returns a view position moved inside the world."""
+        return (min(max(x, 0), self.world_size[0] - self.view_size[0]),
+                min(max(y, 0), self.world_size[1] - self.view_size[1]))
+
+    def center(self, pos: tuple[int, int]):
+        """Jump to show a world position in the middle of the view."""
+        self.x, self.y = self.clamp(pos[0] - self.view_size[0] // 2, pos[1] - self.view_size[1] // 2)
+
+    def follow(self, pos: tuple[int, int]) -> tuple[int, int]:
+        """Scroll just enough to keep a world position inside the margin of the view.
+        Returns how many cells the view moved by in x and y."""
+        x, y = self.x, self.y
+        # Move the view so the position is no closer than the margin to any edge.
+        x = min(max(x, pos[0] - self.view_size[0] + 1 + self.margin), pos[0] - self.margin)
+        y = min(max(y, pos[1] - self.view_size[1] + 1 + self.margin), pos[1] - self.margin)
+        x, y = self.clamp(x, y)
+        moved = x - self.x, y - self.y
+        self.x, self.y = x, y
+        return moved
+
+    def to_screen(self, pos: tuple[int, int]) -> tuple[int, int]:
+        """Returns the screen cell of a world position."""
+        return pos[0] - self.x, pos[1] - self.y
+
+    def to_world(self, pos: tuple[int, int]) -> tuple[int, int]:
+        """Returns the world position of a screen cell."""
+        return pos[0] + self.x, pos[1] + self.y
+
+    def in_world(self, pos: tuple[int, int]) -> bool:
+        """Returns True if a position is inside the world."""
+        return 0 <= pos[0] < self.world_size[0] and 0 <= pos[1] < self.world_size[1]
+
+    def in_view(self, pos: tuple[int, int]) -> bool:
+        """Returns True if a world position is shown."""
+        return 0 <= pos[0] - self.x < self.view_size[0] and 0 <= pos[1] - self.y < self.view_size[1]
@@ -0,0 +1,106 @@
+"""This file holds the classes that save screenshots and time-lapses in the background."""
+
+# Description:
+#   The following class CaptureWorker is used to save images without stopping the game.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only hands over frames, not caring how they are saved.
+#   This class uses encapsulation because it holds both the queue of frames and the thread that saves them.
+
+# Description:
+#   The following class TimeLapse is used to capture a numbered image every few simulation ticks.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only tells it the time, and it decides when to capture.
+#   This class uses encapsulation because it holds both the capture schedule and the function that follows it.
+
+import queue
+import threading
+from pathlib import Path
+
+import pygame as pg
+
+# Seconds quitting waits for the worker to finish saving before giving up on the frames left.
+CLOSE_TIMEOUT = 5.0
+
+
+class CaptureWorker:
+    """Saves copies of frames to image files on a background thread."""
+    def __init__(self, max_queue: int = 8):
+        """Start the worker. At most max_queue frames wait to be saved at once."""
+        self.queue = queue.Queue(max_queue)
+        self.thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self.thread.start()
+
+    def submit(self, surface: pg.Surface, path: Path, block: bool = True, announce: bool = False) -> bool:
+        """Copy the surface and queue it to be saved at path.
+        If block is False and the queue is full, nothing is copied and False is returned.
+        If announce is True, the file name is printed once saved."""
+        # Check for room first so a full queue doesn't cost a copy.
+        if not block and self.queue.full():
+            return False
+        # Copy the frame buffer now, so the game can keep drawing on the surface.
+        frame = pg.image.tostring(surface, "RGB"), surface.get_size(), path, announce
+        try:
+            self.queue.put(frame, block)
+        except queue.Full:
+            return False
+        return True
+
+    def _run(self):
+        """Save frames until a None is queued."""
+        while (frame := self.queue.get()) is not None:
+            data, size, path, announce = frame
+            # A failed save, such as on a full disk, is reported but doesn't stop the worker,
+            # so the queue keeps draining and the game never waits on it forever.
+            try:
+                # Make the directory if it doesn't exist.
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Encode and write the image.
+                pg.image.save(pg.image.fromstring(data, size, "RGB"), str(path))
+            except (OSError, pg.error) as error:
+                print(f'Could not save {path}: {error}')
+                continue
+            # Record the capture.
+            if announce:
+                print(f'Saved screenshot: {path.name}')
+
+    def close(self):
+        """Finish saving the queued frames and stop the worker.
+        Gives up after CLOSE_TIMEOUT seconds, so quitting never hangs on a stuck save."""
+        if not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=CLOSE_TIMEOUT)
+        except queue.Full:
+            print('Gave up waiting for the images left to save.')
+            return
+        self.thread.join(CLOSE_TIMEOUT)
+
+
+class TimeLapse:
+    """Captures a numbered image sequence every interval simulation ticks."""
+    def __init__(self, worker: CaptureWorker, directory: Path, interval: int, start_time: int):
+        """Capture into directory through the worker, starting at start_time."""
+        self.worker = worker
+        self.directory = directory
+        self.interval = interval
+        # The time of the next capture and the number of the next image.
+        self.next_time = start_time
+        self.frame = 0
+
+    def update(self, surface: pg.Surface, time: int):
+        """Capture the surface if a capture is due at the given time.
+        When the worker is busy, the capture waits for a later frame instead of stalling this one."""
+        if time < self.next_time:
+            return
+        if self.worker.submit(surface, self.directory / f'{self.frame:06d}.png', block=False):
+            self.frame += 1
+            # Schedule the next capture, skipping any that were missed.
+            self.next_time += ((time - self.next_time) // self.interval + 1) * self.interval
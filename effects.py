@@ -0,0 +1,60 @@
+"""This file holds the ambient day and night light and the water shimmer, shown by changing palette colors."""
+
+# Description:
+#   The following class AmbientEffects is used to animate the light of the garden and its water.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only asks for the colors to show each frame, without
+#   knowing how the light changes.
+#   This class uses encapsulation because it holds the palette indices of the water shades along with
+#   the functions that color them.
+
+import math
+
+import numpy as np
+
+import bitfont as bf
+from simulation import WATER_TILE
+
+# Simulation ticks in a full day and night.
+DAY_LENGTH = 600
+# How much of the red, green, and blue light is left in the middle of the night.
+NIGHT_LIGHT = np.array([0.35, 0.4, 0.65], np.float32)
+# Number of water colors shimmering one after another, each on its own diagonal of water cells.
+WATER_SHADES = 4
+# Seconds of real time for one shimmer of the water.
+SHIMMER_PERIOD = 2.0
+# How far the water brightness swings around its middle value.
+SHIMMER_DEPTH = 0.2
+
+
+class AmbientEffects:
+    """Colors of the palette as lit at a time of day, with shimmering water.
+    The cells never change for the effects, only the colors their palette indices are shown with."""
+    def __init__(self, palette: bf.Palette):
+        """Given the palette of the screen, returns the effects for it, adding the water shades to it."""
+        self.palette = palette
+        # Every water shade is the water color under its own palette index, so they can be lit separately.
+        self.water_indices = [palette.add(WATER_TILE[1]) for _ in range(WATER_SHADES)]
+
+    def water_cell(self, pos: tuple[int, int]) -> bf.surface.CellType:
+        """Returns the cell to draw water with at a position."""
+        return WATER_TILE[0], self.water_indices[(pos[0] + pos[1]) % WATER_SHADES], WATER_TILE[2]
+
+    @staticmethod
+    def daylight(global_time: int) -> float:
+        """Returns how bright the day is at a simulation time, from 0 at night to 1 during the day."""
+        # Full daylight and full night each last a third of the day, with dawn and dusk between them.
+        return min(max(0.5 + math.cos(2 * math.pi * global_time / DAY_LENGTH), 0.0), 1.0)
+
+    def colors(self, global_time: int, seconds: float) -> np.ndarray:
+        """Returns the (256, 3) palette colors to show at a simulation time and a real time in seconds."""
+        light = NIGHT_LIGHT + (1 - NIGHT_LIGHT) * self.daylight(global_time)
+        colors = self.palette.colors * light
+        # Each shade gets brighter and darker a little after the one before it, so waves roll over the water.
+        phases = 2 * math.pi * (seconds / SHIMMER_PERIOD - np.arange(WATER_SHADES) / WATER_SHADES)
+        colors[self.water_indices] *= (1 - SHIMMER_DEPTH + SHIMMER_DEPTH * np.sin(phases))[:, None]
+        return colors.astype(np.uint8)
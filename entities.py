@@ -0,0 +1,171 @@
+"""This file holds the gardeners and animals that wander around the garden on their own."""
+
+# Description:
+#   The following class Entities is used to hold and move every wandering gardener and animal at once.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the simulation only asks it to take a step and which cells changed,
+#   not how every entity picks where to go.
+#   This class uses encapsulation because it holds the positions, directions, and kinds of all the entities
+#   in arrays, along with the occupancy grid that keeps them from walking into each other.
+
+from typing import Union
+
+import numpy as np
+
+# The kinds of entities, indexed by kind.
+GARDENER = 0
+RABBIT = 1
+# The cell every kind is drawn with.
+ENTITY_TILES = (
+    (0x02, (255, 200, 150), (0, 0, 0)),
+    (0x72, (200, 200, 200), (0, 0, 0)),
+)
+# Whether every kind can walk on every grid tile, indexed by kind and then tile value.
+# Nothing walks on water, and rabbits keep off the farmland.
+WALKABLE = np.array([
+    [False, True, True],
+    [False, True, False],
+], np.bool_)
+# Chance of every kind turning to a random direction on a tick.
+TURN_CHANCE = np.array([0.1, 0.3], np.float32)
+# Chance of every kind standing still on a tick.
+REST_CHANCE = np.array([0.5, 0.2], np.float32)
+# The four directions an entity can face.
+DIRECTIONS = np.array([(1, 0), (-1, 0), (0, -1), (0, 1)], np.int32)
+# Occupancy of a free cell, and of a cell held by something that isn't an entity, such as the player.
+EMPTY = -1
+RESERVED = -2
+
+
+class Entities:
+    """Every wandering entity of a world, stored as rows of arrays instead of one object each.
+    The occupancy grid holds the row of the entity in every cell, so no two entities share a cell."""
+    def __init__(self, size: tuple[int, int], capacity: int = 64):
+        """Create no entities in a world of the given size, with room for capacity entities before growing."""
+        self.size = size
+        self.count = 0
+        # The rows past count are spare room.
+        self.positions = np.zeros((capacity, 2), np.int32)
+        self.directions = np.zeros((capacity, 2), np.int32)
+        self.kinds = np.zeros(capacity, np.uint8)
+        # The row of the entity in every cell, EMPTY or RESERVED where there is none.
+        self.occupancy = np.full(size, EMPTY, np.int32)
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self, count: int):
+        """Make room for at least count entities, doubling the arrays so adding stays cheap."""
+        capacity = len(self.kinds)
+        if count <= capacity:
+            return
+        capacity = max(count, capacity * 2)
+        for name in ("positions", "directions", "kinds"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, *old.shape[1:]), old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, positions: np.ndarray, kinds: np.ndarray, directions: np.ndarray = None) -> np.ndarray:
+        """Add entities at an (N, 2) array of positions, with the given kinds and directions.
+        The directions default to facing right. Returns the rows of the new entities.
+        Raises a ValueError if a position is taken or two of them are the same."""
+        positions = np.asarray(positions, np.int32).reshape(-1, 2)
+        xs, ys = positions.T
+        if (self.occupancy[xs, ys] != EMPTY).any() or len(np.unique(positions, axis=0)) < len(positions):
+            raise ValueError("Entities can't be added to taken cells.")
+        if directions is None:
+            directions = DIRECTIONS[0]
+        rows = np.arange(self.count, self.count + len(positions))
+        self._grow(self.count + len(positions))
+        self.positions[rows] = positions
+        self.directions[rows] = directions
+        self.kinds[rows] = kinds
+        self.occupancy[xs, ys] = rows
+        self.count += len(positions)
+        return rows
+
+    def remove(self, row: int) -> tuple[int, int]:
+        """Remove the entity in a row, moving the last entity into its row. Returns its position."""
+        pos = tuple(self.positions[row].tolist())
+        self.occupancy[pos] = EMPTY
+        self.count -= 1
+        # Fill the gap with the last row, so the entities stay packed at the start of the arrays.
+        if row != self.count:
+            self.positions[row] = self.positions[self.count]
+            self.directions[row] = self.directions[self.count]
+            self.kinds[row] = self.kinds[self.count]
+            self.occupancy[tuple(self.positions[row].tolist())] = row
+        return pos
+
+    def spawn(self, grid: np.ndarray, rng: np.random.Generator, count: int, kind: int) -> np.ndarray:
+        """Add up to count entities of a kind on random free cells they can walk on.
+        Returns the rows of the new entities, fewer than count if the world runs out of room."""
+        free = np.flatnonzero(WALKABLE[kind][grid] & (self.occupancy == EMPTY))
+        cells = rng.choice(free, min(count, len(free)), replace=False)
+        positions = np.stack(np.unravel_index(cells, self.size), axis=1)
+        directions = DIRECTIONS[rng.integers(len(DIRECTIONS), size=len(cells))]
+        return self.add(positions, np.full(len(cells), kind, np.uint8), directions)
+
+    def reserve(self, pos: tuple[int, int]) -> bool:
+        """Keep entities out of a free cell, such as the one the player stands on. Returns False if it is taken."""
+        if self.occupancy[pos] != EMPTY:
+            return False
+        self.occupancy[pos] = RESERVED
+        return True
+
+    def release(self, pos: tuple[int, int]):
+        """Let entities back into a reserved cell."""
+        if self.occupancy[pos] == RESERVED:
+            self.occupancy[pos] = EMPTY
+
+    def cell_at(self, pos: tuple[int, int]) -> Union[tuple, None]:
+        """Returns the cell to draw the entity at a position with, or None if there is none."""
+        row = self.occupancy[pos]
+        if row < 0:
+            return None
+        return ENTITY_TILES[self.kinds[row]]
+
+    def step(self, grid: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Move every entity one tick, all at once.
+        Entities move a cell forward unless resting, and only onto free cells of tiles they can walk on.
+        When several want the same cell, the one in the lowest row gets it. Entities that are blocked turn.
+        Returns the (N, 2) array of the cells that changed, both the old and the new positions."""
+        count = self.count
+        if not count:
+            return np.empty((0, 2), np.int32)
+        positions = self.positions[:count]
+        directions = self.directions[:count]
+        kinds = self.kinds[:count]
+        # Turn some of the entities.
+        turning = rng.random(count) < TURN_CHANCE[kinds]
+        directions[turning] = DIRECTIONS[rng.integers(len(DIRECTIONS), size=np.count_nonzero(turning))]
+        # Look at the cell in front of every entity that isn't resting.
+        rows = np.flatnonzero(rng.random(count) >= REST_CHANCE[kinds])
+        targets = positions[rows] + directions[rows]
+        inside = ((targets >= 0) & (targets < self.size)).all(axis=1)
+        edge = rows[~inside]
+        rows, targets = rows[inside], targets[inside]
+        xs, ys = targets.T
+        # Only step onto free cells that can be walked on. Cells still held by an entity count as taken,
+        # even if it is leaving them this tick, so no two entities can ever end up on the same cell.
+        free = WALKABLE[kinds[rows], grid[xs, ys]] & (self.occupancy[xs, ys] == EMPTY)
+        # Give every wanted cell to the first entity wanting it.
+        cells = np.flatnonzero(free)
+        _, first = np.unique(xs[cells] * self.size[1] + ys[cells], return_index=True)
+        moved = np.zeros(len(rows), np.bool_)
+        moved[cells[first]] = True
+        # The blocked entities turn, so they don't keep walking into the same wall.
+        blocked = np.concatenate((edge, rows[~moved]))
+        directions[blocked] = DIRECTIONS[rng.integers(len(DIRECTIONS), size=len(blocked))]
+        # Move the entities, clearing their old cells before filling the new ones.
+        rows, targets = rows[moved], targets[moved]
+        old = positions[rows].copy()
+        self.occupancy[old[:, 0], old[:, 1]] = EMPTY
+        self.occupancy[targets[:, 0], targets[:, 1]] = rows
+        positions[rows] = targets
+        return np.concatenate((old, targets))
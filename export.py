@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""This file holds the tool for exporting a whole world to one giant PNG image."""
+
+# Description:
+#   The following class PNGWriter is used to write a PNG image a few rows at a time.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because rows of pixels go in without caring about the PNG format.
+#   This class uses encapsulation because it holds both the open file and compressor and the functions
+#   that write chunks to it.
+
+import argparse
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pygame as pg
+
+import bitfont as bf
+
+from simulation import Simulation, GRID_TILES
+from worldgen import TerrainGenerator
+
+# A cell source takes a rect (x, y, w, h) and returns the tile, fg, and bg arrays of the cells in it.
+CellSource = Callable[[tuple[int, int, int, int]], tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+# Lookup arrays of the grid tiles, indexed by tile value.
+GRID_TILE_IDS = np.array([GRID_TILES[tile][0] for tile in sorted(GRID_TILES)], np.uint8)
+GRID_FG = np.array([GRID_TILES[tile][1] for tile in sorted(GRID_TILES)], np.uint8)
+GRID_BG = np.array([GRID_TILES[tile][2] for tile in sorted(GRID_TILES)], np.uint8)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class PNGWriter:
+    """Writes an 8 bit RGB PNG image row by row, so the whole image is never in memory."""
+    def __init__(self, path: Path, width: int, height: int, level: int = 6):
+        """Open the file at path and write the header for an image of the given pixel size."""
+        self.width, self.height = width, height
+        self.rows_written = 0
+        self.file = open(path, 'wb')
+        self.file.write(PNG_SIGNATURE)
+        # Width, height, 8 bits per channel, RGB, default compression, filter, and no interlace.
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        self.compressor = zlib.compressobj(level)
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        """Write one PNG chunk with its length and checksum."""
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, pixels: np.ndarray):
+        """Write the next rows of the image from a (rows, width, 3) uint8 array."""
+        if pixels.shape[1:] != (self.width, 3):
+            raise ValueError(f"Rows must have shape (n, {self.width}, 3), not {pixels.shape}.")
+        if self.rows_written + len(pixels) > self.height:
+            raise ValueError("More rows written than the image height.")
+        # Start every row with filter type zero, meaning no filter.
+        rows = np.zeros((len(pixels), 1 + self.width * 3), np.uint8)
+        rows[:, 1:] = pixels.reshape(len(pixels), -1)
+        if data := self.compressor.compress(rows.tobytes()):
+            self._write_chunk(b'IDAT', data)
+        self.rows_written += len(pixels)
+
+    def close(self):
+        """Write the rest of the image data and the end of the file."""
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written.")
+        self._write_chunk(b'IDAT', self.compressor.flush())
+        self._write_chunk(b'IEND', b'')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def terrain_cells(generator: TerrainGenerator) -> CellSource:
+    """Returns a cell source drawing the terrain of a generator, made region by region."""
+    def cells(rect):
+        grid = generator.region(rect)
+        return GRID_TILE_IDS[grid], GRID_FG[grid], GRID_BG[grid]
+    return cells
+
+
+def simulation_cells(simulation: Simulation) -> CellSource:
+    """Returns a cell source drawing the grid and plants of a simulation as they are now.
+    The source reads from copies, so it can render on another thread while the simulation goes on."""
+    table = simulation.species
+    grid = simulation.grid.copy()
+    species = simulation.plant_species.copy()
+    # The stage of the plant in every cell, where there is one.
+    stages = np.zeros(simulation.size, np.uint8)
+    for pos, plant in simulation.plants.items():
+        stages[pos] = plant.stage
+
+    def cells(rect):
+        x, y, w, h = rect
+        region = grid[x:x + w, y:y + h]
+        tiles, fg, bg = GRID_TILE_IDS[region], GRID_FG[region], GRID_BG[region]
+        # Draw the plants in the region over the grid.
+        plant_species, plant_stages = species[x:x + w, y:y + h], stages[x:x + w, y:y + h]
+        planted = plant_species >= 0
+        tiles[planted] = table.tiles[plant_species[planted], plant_stages[planted]]
+        fg[planted] = table.colors[plant_species[planted], plant_stages[planted]]
+        bg[planted] = 0
+        return tiles, fg, bg
+    return cells
+
+
+def export_world(path: Path, size: tuple[int, int], cells: CellSource, font: bf.Font,
+                 tile_size: tuple[int, int] = (64, 4)):
+    """Render a world of size cells to a PNG image at path, one tile of cells at a time.
+    Only one row of tiles is held in memory, so the memory used grows with the world width but not its height.
+    The main pygame display surface must already be created with pygame.display.set_mode."""
+    width, height = size
+    tile_width, tile_height = tile_size
+    # One surface is reused to render every tile.
+    surface = bf.PygameSurface(tile_size, font)
+    with PNGWriter(path, width * font.pixel_width, height * font.pixel_height) as writer:
+        for y in range(0, height, tile_height):
+            rows = min(tile_height, height - y)
+            band = np.zeros((rows * font.pixel_height, width * font.pixel_width, 3), np.uint8)
+            for x in range(0, width, tile_width):
+                cols = min(tile_width, width - x)
+                # Clear the surface, since the tiles at the edges don't fill all of it.
+                surface.fill((0, (255, 255, 255), (0, 0, 0)))
+                tiles, fg, bg = cells((x, y, cols, rows))
+                surface.tile_array[:cols, :rows] = tiles
+                surface.fg_array[:cols, :rows] = fg
+                surface.bg_array[:cols, :rows] = bg
+                # Render the whole tile.
+                surface.flip = True
+                surface.update()
+                # Copy the pixels into the band, swapping from (x, y) to (row, column) order.
+                pixels = pg.surfarray.array3d(surface.image)[:cols * font.pixel_width, :rows * font.pixel_height]
+                band[:, x * font.pixel_width:(x + cols) * font.pixel_width] = pixels.transpose(1, 0, 2)
+            writer.write_rows(band)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a generated world to a PNG image.")
+    parser.add_argument("path", type=Path, help="the PNG file to write")
+    parser.add_argument("--seed", type=int, required=True, help="seed of the terrain")
+    parser.add_argument("--size", type=int, nargs=2, default=(256, 256), metavar=("WIDTH", "HEIGHT"),
+                        help="size of the world in cells")
+    parser.add_argument("--font", type=Path, default=Path() / 'bitfont' / 'fonts' / 'CP437_24x24.png',
+                        help="font image to render the cells with")
+    args = parser.parse_args()
+
+    # A display is needed to load fonts, but it never has to be shown.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pg.init()
+    pg.display.set_mode((1, 1))
+    export_world(args.path, tuple(args.size), terrain_cells(TerrainGenerator(args.seed)), bf.Font(args.font))
+    print(f'Exported world: {args.path}')
+    pg.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""This file holds the undo and redo history of the player's actions."""
+
+# Description:
+#   The following class Change is used to hold everything one action of the player changed.
+#
+# OOP Principles Used:
+#   Encapsulation
+#
+# Reasoning:
+#   This class uses encapsulation because it keeps the records of an action together with the
+#   inventory states around it.
+
+# Description:
+#   The following class History is used to undo and redo the changes the player makes to the world.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only marks where actions start and end, and asks
+#   for an undo or redo.
+#   This class uses encapsulation because it holds both the recorded changes and the functions that
+#   reverse and replay them.
+
+from collections import deque
+from typing import Any, Union
+
+from simulation import Simulation, Plant
+
+
+class Change:
+    """The reversible records of one action, with the inventory state before and after it."""
+    def __init__(self, records: list[tuple], before: Any, after: Any):
+        self.records = records
+        self.before = before
+        self.after = after
+
+
+class History:
+    """Ring buffers of undoable and redoable actions on a simulation.
+    Actions are stored as the changes they made, so taking a snapshot is free and undoing an action
+    costs only as much as the action changed."""
+    def __init__(self, simulation: Simulation, capacity: int = 100):
+        """Create an empty history holding at most capacity actions."""
+        self.simulation = simulation
+        self.undo_stack: deque[Change] = deque(maxlen=capacity)
+        self.redo_stack: deque[Change] = deque(maxlen=capacity)
+        # The inventory state when the current action began.
+        self.before = None
+
+    def begin(self, inventory_state: Any):
+        """Start recording an action. The inventory state is restored when the action is undone."""
+        self.simulation.journal = []
+        self.before = inventory_state
+
+    def commit(self, inventory_state: Any):
+        """Stop recording and store the action if it changed anything."""
+        records = self.simulation.journal
+        self.simulation.journal = None
+        if records or inventory_state != self.before:
+            self.undo_stack.append(Change(records, self.before, inventory_state))
+            # A new action replaces everything that was undone.
+            self.redo_stack.clear()
+        self.before = None
+
+    def undo(self) -> Union[Any, None]:
+        """Reverse the last action. Returns the inventory state to restore, or None if there was nothing to undo."""
+        if not self.undo_stack:
+            return None
+        change = self.undo_stack.pop()
+        for record in reversed(change.records):
+            self._apply(record, True)
+        self.redo_stack.append(change)
+        return change.before
+
+    def redo(self) -> Union[Any, None]:
+        """Replay the last undone action. Returns the inventory state to restore, or None if there was nothing."""
+        if not self.redo_stack:
+            return None
+        change = self.redo_stack.pop()
+        for record in change.records:
+            self._apply(record, False)
+        self.undo_stack.append(change)
+        return change.after
+
+    def _apply(self, record: tuple, reverse: bool):
+        """Apply a single record forwards or in reverse."""
+        kind = record[0]
+        if kind == "tile":
+            pos, old, new = record[1:]
+            self.simulation.set_tile(pos, old if reverse else new)
+        elif kind == "water":
+            plant, stage, needs_water = record[1:]
+            # The watering belongs to the stage it was done in, so a plant that grew since keeps its own needs.
+            if plant.stage != stage:
+                return
+            # Only plants still in the world are counted in the statistics.
+            counted = self.simulation.plants.get(plant.pos, None) is plant
+            if counted:
+                self.simulation.stats.count(plant, -1)
+            plant.needs_water = needs_water if reverse else False
+            if counted:
+                self.simulation.stats.count(plant)
+            self.simulation.updates.add(plant.pos)
+        elif (kind == "insert") == reverse:
+            self._remove(record[1])
+        else:
+            self._insert(record[1])
+
+    def _insert(self, plant: Plant):
+        """Put a plant back, removing whatever has grown in its place since."""
+        if (other := self.simulation.plants.get(plant.pos, None)) is not None:
+            self.simulation.remove_plant(other)
+        self.simulation.insert_plant(plant)
+
+    def _remove(self, plant: Plant):
+        """Take a plant out, if it is still in the world."""
+        if self.simulation.plants.get(plant.pos, None) is plant:
+            self.simulation.remove_plant(plant)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+"""This file holds the headless host that runs many saved gardens at once on a pool of worker processes."""
+
+# Description:
+#   The following class Garden is used to run one simulation inside a worker, on its own clock.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the worker only asks it to run the ticks that are due.
+#   This class uses encapsulation because it holds the simulation, its clock, and its metrics together.
+
+# Description:
+#   The following class GardenHost is used to spread gardens over worker processes and keep them balanced.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the gardens are run by only giving it their files.
+#   This class uses encapsulation because it holds the workers and which garden runs where, along with
+#   the functions that start, measure, balance, and stop them.
+
+import argparse
+import multiprocessing as mp
+import os
+import signal
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+import numpy as np
+
+from inventory import SPECIES
+from simulation import Simulation, TickClock
+from worldgen import TerrainGenerator
+
+# Estimated cost of updating one grid cell, relative to updating one plant. Used to balance new gardens.
+CELL_COST = 0.02
+# Move a garden when the busiest worker has this many times the load of the least busy one.
+REBALANCE_RATIO = 1.25
+# Loads below this fraction of a CPU are never worth moving a garden for.
+REBALANCE_MIN_LOAD = 0.05
+# Longest a worker sleeps before checking for commands.
+WORKER_POLL = 0.1
+# Workers start fresh interpreters, so each loads the species files once on every platform.
+CONTEXT = mp.get_context("spawn")
+
+
+def load_species(species_paths: list[Path]):
+    """Load extra plant species files into the species registry."""
+    for path in species_paths:
+        SPECIES.load(path)
+
+
+def estimate_cost(path: Path) -> float:
+    """Returns the estimated cost of one tick of the garden saved at path, without loading its plants."""
+    with np.load(path) as data:
+        return len(data["plant_species"]) + data["grid"].size * CELL_COST
+
+
+def balance(costs: dict[Path, float], workers: int) -> list[list[Path]]:
+    """Split gardens into shards of about equal cost, giving the costliest gardens out first."""
+    shards: list[list[Path]] = [[] for _ in range(workers)]
+    loads = [0.0] * workers
+    for path in sorted(costs, key=costs.get, reverse=True):
+        worker = loads.index(min(loads))
+        shards[worker].append(path)
+        loads[worker] += costs[path]
+    return shards
+
+
+def generate_garden(path: Path, size: tuple[int, int], seed: int, density: float = 0.01):
+    """Save a new garden at path with generated terrain and a scattering of every plant species."""
+    simulation = Simulation(size, SPECIES, seed)
+    simulation.grid[...] = TerrainGenerator(seed).region((0, 0, *size))
+    for species in range(len(SPECIES)):
+        # Plant on a random few of the cells the species can grow on.
+        xs, ys = np.nonzero(SPECIES.valid[species][simulation.grid] & (simulation.plant_species < 0))
+        chosen = simulation.rng.random(len(xs)) < density
+        for pos in zip(xs[chosen].tolist(), ys[chosen].tolist()):
+            simulation.add_plant(pos, species)
+    simulation.save(path)
+
+
+class Garden:
+    """A saved simulation run by a worker, with its own clock and metrics."""
+    def __init__(self, path: Path, tick_rate: float, max_catchup: int):
+        """Load the garden at path to run at tick_rate ticks per second."""
+        self.path = path
+        self.simulation = Simulation.load(path, SPECIES)
+        self.clock = TickClock(tick_rate, max_catchup)
+        # Metrics since the last report.
+        self.ticks = 0
+        self.busy = 0.0
+        self.worst = 0.0
+        self.dropped = 0
+
+    def run_due(self):
+        """Run the ticks that are due."""
+        ticks = self.clock.advance()
+        if not ticks:
+            return
+        start = time.perf_counter()
+        self.simulation.update_ticks(ticks)
+        # Nothing draws hosted gardens, so don't let the changed cells pile up.
+        self.simulation.updates.clear()
+        elapsed = time.perf_counter() - start
+        self.ticks += ticks
+        self.busy += elapsed
+        self.worst = max(self.worst, elapsed)
+
+    def report(self) -> dict:
+        """Returns the metrics since the last report and starts counting again."""
+        metrics = {"ticks": self.ticks, "busy": self.busy, "worst": self.worst,
+                   "dropped": self.clock.dropped - self.dropped, "plants": len(self.simulation.plants),
+                   "time": self.simulation.global_time}
+        self.ticks, self.busy, self.worst, self.dropped = 0, 0.0, 0.0, self.clock.dropped
+        return metrics
+
+
+def worker_main(connection: Connection, paths: list[Path], tick_rate: float, max_catchup: int,
+                species_paths: list[Path]):
+    """Run gardens in a worker process, answering commands from the host between ticks.
+    Every command is a (name, argument) tuple and gets exactly one reply."""
+    # The host stops the workers itself, so they save their gardens instead of dying on Ctrl+C.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    load_species(species_paths)
+    gardens = {path: Garden(path, tick_rate, max_catchup) for path in paths}
+    while True:
+        # Give every garden its due ticks in turn.
+        for garden in gardens.values():
+            garden.run_due()
+        # Sleep until the next tick is due, waking early for commands.
+        wait = min((garden.clock.time_until_tick() for garden in gardens.values()), default=WORKER_POLL)
+        if not connection.poll(min(wait, WORKER_POLL)):
+            continue
+        try:
+            command, argument = connection.recv()
+        except EOFError:
+            # The host is gone, so stop like it asked.
+            command, argument = "stop", None
+        if command == "metrics":
+            connection.send({path: garden.report() for path, garden in gardens.items()})
+        elif command == "save":
+            for garden in gardens.values():
+                garden.simulation.save(garden.path)
+            connection.send(None)
+        elif command == "release":
+            # Save the garden so another worker can adopt it.
+            gardens.pop(argument).simulation.save(argument)
+            connection.send(None)
+        elif command == "adopt":
+            gardens[argument] = Garden(argument, tick_rate, max_catchup)
+            connection.send(None)
+        elif command == "stop":
+            for garden in gardens.values():
+                garden.simulation.save(garden.path)
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            return
+
+
+class GardenHost:
+    """Runs many saved gardens on worker processes, each garden on its own tick clock.
+    Gardens are first split by their estimated cost, then moved between workers by their measured cost."""
+    def __init__(self, paths: list[Path], workers: int, tick_rate: float, max_catchup: int = 10,
+                 species_paths: list[Path] = ()):
+        """Prepare to run the gardens saved at paths on the given number of workers."""
+        self.paths = paths
+        self.workers = max(1, min(workers, len(paths)))
+        self.tick_rate = tick_rate
+        self.max_catchup = max_catchup
+        self.species_paths = list(species_paths)
+        self.processes: list[mp.process.BaseProcess] = []
+        self.connections: list[Connection] = []
+        # The worker running every garden.
+        self.assignment: dict[Path, int] = {}
+        # The number of gardens moved between workers so far.
+        self.moves = 0
+
+    def start(self):
+        """Start the workers with the gardens balanced by estimated cost."""
+        shards = balance({path: estimate_cost(path) for path in self.paths}, self.workers)
+        for worker, shard in enumerate(shards):
+            parent, child = CONTEXT.Pipe()
+            process = CONTEXT.Process(target=worker_main, name=f"garden worker {worker}", daemon=True,
+                                      args=(child, shard, self.tick_rate, self.max_catchup, self.species_paths))
+            process.start()
+            self.processes.append(process)
+            self.connections.append(parent)
+            for path in shard:
+                self.assignment[path] = worker
+
+    def request(self, worker: int, command: str, argument=None):
+        """Send a command to a worker and return its reply."""
+        self.connections[worker].send((command, argument))
+        return self.connections[worker].recv()
+
+    def metrics(self) -> dict[Path, dict]:
+        """Returns the metrics of every garden since the last call, with the worker running it."""
+        metrics = {}
+        for worker in range(self.workers):
+            for path, garden in self.request(worker, "metrics").items():
+                metrics[path] = {**garden, "worker": worker}
+        return metrics
+
+    def rebalance(self, metrics: dict[Path, dict], elapsed: float) -> bool:
+        """Move one garden from the busiest worker to the least busy one, if that evens out their measured
+        loads. The metrics must cover elapsed seconds. Returns True if a garden was moved."""
+        loads = [0.0] * self.workers
+        for garden in metrics.values():
+            loads[garden["worker"]] += garden["busy"] / elapsed
+        busiest, idlest = loads.index(max(loads)), loads.index(min(loads))
+        if loads[busiest] < REBALANCE_MIN_LOAD or loads[busiest] < loads[idlest] * REBALANCE_RATIO:
+            return False
+        # Pick the garden that leaves the two workers closest to even.
+        best, best_peak = None, loads[busiest]
+        for path, garden in metrics.items():
+            if garden["worker"] != busiest:
+                continue
+            load = garden["busy"] / elapsed
+            peak = max(loads[busiest] - load, loads[idlest] + load)
+            if peak < best_peak:
+                best, best_peak = path, peak
+        if best is None:
+            return False
+        self.request(busiest, "release", best)
+        self.request(idlest, "adopt", best)
+        self.assignment[best] = idlest
+        self.moves += 1
+        return True
+
+    def save(self):
+        """Save every garden to its file."""
+        for worker in range(self.workers):
+            self.request(worker, "save")
+
+    def stop(self):
+        """Save every garden and stop the workers."""
+        for worker in range(self.workers):
+            self.request(worker, "stop")
+        for process in self.processes:
+            process.join()
+
+
+def print_report(metrics: dict[Path, dict], elapsed: float, tick_rate: float):
+    """Print the tick rate, load, and latency of every garden."""
+    print(f"{'garden':<24} {'worker':>6} {'plants':>7} {'time':>8} {'ticks/s':>8} {'dropped':>7} "
+          f"{'cpu %':>6} {'worst ms':>8}")
+    for path, garden in sorted(metrics.items()):
+        print(f"{path.stem[:24]:<24} {garden['worker']:>6} {garden['plants']:>7} {garden['time']:>8} "
+              f"{garden['ticks'] / elapsed:>8.1f} {garden['dropped']:>7} {garden['busy'] / elapsed * 100:>6.1f} "
+              f"{garden['worst'] * 1000:>8.2f}")
+    total = sum(garden["ticks"] for garden in metrics.values()) / elapsed
+    print(f"{len(metrics)} gardens at {total:.1f} ticks/s of {len(metrics) * tick_rate:.1f} wanted\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many saved gardens at once without a window.")
+    parser.add_argument("gardens", type=Path, nargs="*",
+                        help="saved garden files made with F5, or directories of them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--tick-rate", type=float, default=10, help="simulation ticks per second of every garden")
+    parser.add_argument("--max-catchup", type=int, default=10,
+                        help="most ticks to run at once for a garden that fell behind")
+    parser.add_argument("--report-interval", type=float, default=5, help="seconds between metric reports")
+    parser.add_argument("--save-interval", type=float, default=0,
+                        help="seconds between saving every garden, 0 to only save on exit")
+    parser.add_argument("--generate", type=int, default=0, metavar="N",
+                        help="first make N new gardens in saves/host to run")
+    parser.add_argument("--size", type=int, nargs=2, default=(66, 50), metavar=("WIDTH", "HEIGHT"),
+                        help="size of generated gardens in cells")
+    parser.add_argument("--species", type=Path, action="append", default=[],
+                        help="JSON file of extra plant species to load, can be given more than once")
+    args = parser.parse_args()
+    # Keep the workers from each greeting on start.
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    load_species(args.species)
+
+    # Make the new gardens, seeded by their number.
+    paths = []
+    for number in range(args.generate):
+        path = Path() / 'saves' / 'host' / f'garden{number:04d}.npz'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        generate_garden(path, tuple(args.size), number)
+        paths.append(path)
+    # Find the saved gardens.
+    for path in args.gardens:
+        paths.extend(sorted(path.glob('*.npz')) if path.is_dir() else [path])
+    if not paths:
+        parser.error("no gardens to run")
+
+    # Stop and save on a terminate signal the same as on Ctrl+C.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    host = GardenHost(paths, args.workers, args.tick_rate, args.max_catchup, args.species)
+    host.start()
+    print(f'Hosting {len(paths)} gardens on {host.workers} workers')
+    last_report = last_save = time.perf_counter()
+    try:
+        while True:
+            time.sleep(args.report_interval)
+            now = time.perf_counter()
+            metrics = host.metrics()
+            print_report(metrics, now - last_report, args.tick_rate)
+            if host.rebalance(metrics, now - last_report):
+                print(f'Moved a garden, {host.moves} moves so far')
+            last_report = now
+            if args.save_interval and now - last_save >= args.save_interval:
+                host.save()
+                last_save = now
+    except KeyboardInterrupt:
+        pass
+    host.stop()
+    print(f'Saved {len(paths)} gardens')
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@
 #   This class uses inheritance because it is a subclass from Item.
 #   This class uses polymorphism because it acts like a regular item in the player inventory.
 
+from species import SpeciesRegistry
+
 __all__ = [
     "Item",
     "Seed",
@@ -29,6 +31,7 @@ __all__ = [
     "WATERING_CAN_FULL",
 
     "ALL_SEEDS",
+    "SPECIES",
 ]
 
 HOE = "Hoe"
@@ -87,6 +90,17 @@ ALL_SEEDS = (
     MUSHROOM_DATA,
 )
 
+# Chance per tick for a grown plant to seed each free neighbor, by species name.
+SPREAD_CHANCES = {
+    "Grass": 0.001,
+    "Reed": 0.0005,
+}
+
+# Registry of all plant species, starting with the built in seeds.
+SPECIES = SpeciesRegistry()
+for _seed_data in ALL_SEEDS:
+    SPECIES.register(*_seed_data, spread=SPREAD_CHANCES.get(_seed_data[0], 0.0))
+
 
 class Item:
     def __init__(self, name: str):
@@ -105,25 +119,13 @@ class Item:
 
 
 class Seed(Item):
-    def __init__(self, name: str, valid_tiles: tuple[int, ...], stages: list[dict], count: int):
-        super().__init__(name)
-        self.valid_tiles = valid_tiles
-        self.stages = stages
+    def __init__(self, species: int, count: int):
+        super().__init__(SPECIES.names[species])
+        self.species = species
         self.count = count
 
     def get_name(self):
         return f"{self.count} {self.name} seeds"
 
-    def __getitem__(self, item):
-        """Convenience method for unpacking the data."""
-        if item == 0:
-            return self.name
-        elif item == 1:
-            return self.valid_tiles
-        elif item == 2:
-            return self.stages
-        else:
-            raise IndexError("Valid items are 0, 1, and 2.")
-
     def __repr__(self):
-        return f"Seed({self.name}, {self.valid_tiles}, {self.stages}, {self.count})"
+        return f"Seed({self.name}, {self.count})"
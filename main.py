@@ -11,50 +11,131 @@
 #   This class uses encapsulation because it contains both game variables and functions.
 #   This class uses abstraction because running the game is as easy as calling Main.run().
 
+import argparse
+import os
+import random
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Union
 
+import numpy as np
 import pygame as pg
 from pygame.math import Vector2
 
 import bitfont as bf
-
-from simulation import Simulation, vec_to_tuple, PLAYER_TILES, GRID_TILES
+from camera import Camera
+from capture import CaptureWorker, TimeLapse
+from effects import AmbientEffects
+from entities import GARDENER, RABBIT, EMPTY
+from export import export_world, simulation_cells
+from history import History
+from minimap import Minimap
+from spectate import SpectatorServer
+from stats import LOG_INTERVAL
+from simulation import Simulation, Plant, TickClock, vec_to_tuple, PLAYER_TILES, GRID_TILES
 from inventory import *
+from worldgen import TerrainGenerator
+
+# Pixel size of the window, and of the cells of the font it is drawn with.
+SCREEN_SIZE = (800, 600)
+CELL_SIZE = (12, 12)
+# Shapes usable by the area tools, cycled through with the A key.
+AREA_SHAPES = ("Rect", "Circle", "Line")
+# Distance from the targeted tile to the edge of the rect and circle area shapes.
+AREA_RADIUS = 2
+# Number of tiles past the targeted tile covered by the line area shape.
+AREA_LENGTH = 7
+# Milliseconds the idle main loop sleeps waiting for input before running a frame anyway.
+IDLE_TIMEOUT = 1000
+# Milliseconds between the steps of the player walking to a clicked cell.
+WALK_INTERVAL = 60
 
 
 class Main:
-    def __init__(self):
-        """Initialize the application."""
+    def __init__(self, idle: bool = False, frame_cap: int = 0, tick_rate: float = 0, max_catchup: int = 10,
+                 seed: int = None, timelapse_interval: int = 10, terminal: bool = False,
+                 spectate_port: int = None, load: Path = None, effects: bool = False,
+                 world: tuple[int, int] = None, gardeners: int = 0, rabbits: int = 0,
+                 stats_log: Path = None, stats_interval: int = LOG_INTERVAL):
+        """Initialize the application.
+        When idle is True, the main loop sleeps until input arrives and only draws when something changed.
+        The frame_cap limits the frames per second, zero means no limit.
+        The tick_rate makes time pass on its own at that many ticks per second, zero means only on input.
+        The max_catchup limits how many ticks are run at once after a slow frame.
+        The seed makes the random parts of the garden repeat exactly.
+        The timelapse_interval is the number of ticks between time-lapse images.
+        When terminal is True, the cells are drawn on the terminal and keys are read from it.
+        When spectate_port is given, the cells are streamed to spectators connecting to that local port.
+        When load is given, the garden saved at that path is opened instead of making a new one.
+        When effects is True, the light changes between day and night and the water shimmers.
+        The world is the size of a new garden in cells, defaults to the screen size. The screen scrolls to
+        follow the player around bigger gardens.
+        The gardeners and rabbits are how many of each to add wandering around the garden.
+        When stats_log is given, the plant counts are logged every stats_interval ticks and written there as CSV
+        on exit."""
         # Create main screen.
-        self.screen = pg.display.set_mode((800, 600))
+        self.screen = pg.display.set_mode(SCREEN_SIZE)
         pg.display.set_caption("Final Project")
 
         # Create main cell screen.
-        self.font = bf.Font(Path() / 'bitfont' / 'fonts' / 'CP437_12x12.png')
-        self.cell_screen = bf.PygameSurface.refactor_size((800, 600), self.font)
-
-        # Create the cell simulation.
-        self.simulation = Simulation(self.cell_screen.size)
-        # Create the island.
-        points = bf.draw_circle((self.cell_screen.width / 2, self.cell_screen.height / 2), 24.5)
-        for point in points:
-            if self.cell_screen.cell_in_bounds(point):
-                self.simulation.grid[point[0]][point[1]] = 1
-        # Create the lake.
-        points = bf.draw_circle((self.cell_screen.width / 2, self.cell_screen.height / 2), 10.5)
-        for point in points:
-            if self.cell_screen.cell_in_bounds(point):
-                self.simulation.grid[point[0]][point[1]] = 0
+        self.font = bf.Font(Path() / 'bitfont' / 'fonts' / f'CP437_{CELL_SIZE[0]}x{CELL_SIZE[1]}.png')
+        # The game only uses a few colors, so the cells store them as palette indices.
+        palette = bf.Palette()
+        # The effects recolor the palette every frame, which needs the cells rendered as palette indices.
+        self.cell_screen = bf.PygameSurface.refactor_size(SCREEN_SIZE, self.font, palette, effects)
+        self.effects = AmbientEffects(palette) if effects else None
+        # Load the big font for exporting the world as a poster.
+        self.export_font = bf.Font(Path() / 'bitfont' / 'fonts' / 'CP437_24x24.png')
+        # Create the soil moisture heatmap layer beneath the cells, shown with the M key.
+        self.moisture_layer = bf.ColorLayer(self.cell_screen.size, self.font, False)
+        self.cell_screen.add_layer(self.moisture_layer)
+        # Create the plant status layer above it, shown with the C key.
+        self.status_layer = bf.ColorLayer(self.cell_screen.size, self.font, False)
+        self.cell_screen.add_layer(self.status_layer)
+
+        if load is not None:
+            # Open the saved garden, which keeps its own size.
+            self.simulation = Simulation.load(load, SPECIES)
+        else:
+            # Pick a seed if none is given, and show it so the garden can be made again.
+            if seed is None:
+                seed = random.randrange(1 << 32)
+            print(f'Garden seed: {seed}')
+            # Create the cell simulation.
+            self.simulation = Simulation(world or self.cell_screen.size, SPECIES, seed)
+            # Generate the terrain.
+            self.simulation.grid[...] = TerrainGenerator(seed).region((0, 0, *self.simulation.size))
+        # Log the plant counts.
+        self.stats_log = stats_log
+        if stats_log is not None:
+            self.simulation.stats.log_interval = stats_interval
+        # Create the camera showing the part of the world on the screen.
+        self.camera = Camera(self.simulation.size, self.cell_screen.size)
+        # Create the undo history of the player's actions.
+        self.history = History(self.simulation)
+        # Create the overview map of the world, shown with the TAB key.
+        self.minimap = Minimap(self.simulation)
+        self.show_minimap = False
 
         # Create the player.
         self.player_dir = (1, 0)
-        self.player_pos = Vector2(self.cell_screen.width // 2, self.cell_screen.height // 2)
+        self.player_pos = Vector2(self.find_land((self.simulation.size[0] // 2, self.simulation.size[1] // 2)))
+        self.camera.center(vec_to_tuple(self.player_pos))
+        # Keep the wanderers out of the player's cell, then add the new ones.
+        entities = self.simulation.entities
+        entities.reserve(vec_to_tuple(self.player_pos))
+        entities.spawn(self.simulation.grid, self.simulation.rng, gardeners, GARDENER)
+        entities.spawn(self.simulation.grid, self.simulation.rng, rabbits, RABBIT)
         self.player_inventory: list[Item] = [Item(HOE), Item(WATERING_CAN_EMPTY)]
-        for seed_data in ALL_SEEDS:
-            self.player_inventory.append(Seed(*seed_data, count=10))
+        for species in range(len(SPECIES)):
+            self.player_inventory.append(Seed(species, count=10))
         self.current_item = 0
+        # The cells left to walk to a clicked cell, and when the next step is due.
+        self.player_path: list[tuple[int, int]] = []
+        self.next_step_time = 0
 
         # Draw everything for the first time.
         self.draw_play()
@@ -62,32 +143,149 @@ class Main:
         # Create other variables.
         self.inventory = False
         self.colors = False
+        self.moisture_view = False
+        # The moisture version last drawn on the heatmap.
+        self.moisture_version = -1
+        self.area_shape = 0
+        # Cache of the area shapes, moved to wherever the player uses them.
+        self.shapes = bf.ShapeCache()
         self.clock = pg.time.Clock()
+        self.idle = idle
+        self.frame_cap = frame_cap
+        self.tick_clock = TickClock(tick_rate, max_catchup) if tick_rate > 0 else None
+        # Whether the next frame has to be drawn even without changed cells.
+        self.redraw = True
+        self.capture = CaptureWorker()
+        # The thread exporting the world, if one was started.
+        self.export_thread: Union[threading.Thread, None] = None
+        self.timelapse: Union[TimeLapse, None] = None
+        self.timelapse_interval = timelapse_interval
         self.debug = True
         self.debug_font = pg.font.Font(None, 24)
+        # Draw on the terminal instead of the window.
+        self.terminal: Union[bf.TerminalRenderer, None] = None
+        self.terminal_input: Union[bf.TerminalInput, None] = None
+        if terminal:
+            self.terminal = bf.TerminalRenderer(self.cell_screen)
+            self.terminal.start()
+            # Keys can only be read from a real terminal.
+            if sys.stdin.isatty():
+                self.terminal_input = bf.TerminalInput()
+                self.terminal_input.start()
+        # Stream the cells to spectators.
+        self.spectators: Union[SpectatorServer, None] = None
+        if spectate_port is not None:
+            self.spectators = SpectatorServer(self.cell_screen, port=spectate_port)
+            self.spectators.start()
+            print(f'Spectators can watch on port {self.spectators.port}')
+
+    def find_land(self, pos: tuple[int, int]) -> tuple[int, int]:
+        """Returns the free land cell closest to the given position, or the position itself if there is none."""
+        land = np.argwhere((self.simulation.grid != 0) & (self.simulation.entities.occupancy == EMPTY))
+        if not len(land):
+            return pos
+        return tuple(land[np.argmin(((land - pos) ** 2).sum(axis=1))].tolist())
 
     def screenshot(self):
-        """Save the main display surface to the screenshots folder."""
+        """Save the main display surface to the screenshots folder in the background."""
         # Get the name of the screenshot by current time.
         name = datetime.now().strftime("%a %b %d %Y %I.%M.%S %p.png")
-        # Create path to screenshots directory.
-        screenshot_path = Path() / 'screenshots'
-        # If there is no screenshots directory, make it.
-        if not screenshot_path.exists():
-            screenshot_path.mkdir()
-        # Save the main display surface to the screenshots directory.
-        pg.image.save(self.screen, screenshot_path / name)
-        # Record the screenshot.
-        print(f'Saved screenshot: {name}')
+        # The window isn't drawn in terminal mode, so draw it now.
+        if self.terminal:
+            self.cell_screen.flip = True
+            self.cell_screen.update(self.screen)
+        # Hand a copy of the main display surface to the capture worker.
+        self.capture.submit(self.screen, Path() / 'screenshots' / name, announce=True)
+
+    def export(self):
+        """Render the whole world with the export font to a PNG image in the exports folder."""
+        if self.export_thread and self.export_thread.is_alive():
+            print('Still exporting the last world.')
+            return
+        path = Path() / 'exports' / datetime.now().strftime("%a %b %d %Y %I.%M.%S %p.png")
+        path.parent.mkdir(exist_ok=True)
+        # Copy the garden now, then render it on a background thread so the game keeps running.
+        cells = simulation_cells(self.simulation)
+        self.export_thread = threading.Thread(target=self._export, args=(path, self.simulation.size, cells),
+                                              name="export", daemon=True)
+        self.export_thread.start()
+
+    def _export(self, path: Path, size: tuple[int, int], cells):
+        """Render the cells to a PNG image at path, reporting rather than raising errors off the main thread."""
+        try:
+            export_world(path, size, cells, self.export_font)
+        except (OSError, pg.error) as error:
+            print(f'Could not export world: {error}')
+            return
+        print(f'Exported world: {path.name}')
+
+    def save(self):
+        """Save the garden to the saves folder, to open again with --load or run with host.py."""
+        path = Path() / 'saves' / datetime.now().strftime("%a %b %d %Y %I.%M.%S %p.npz")
+        path.parent.mkdir(exist_ok=True)
+        self.simulation.save(path)
+        print(f'Saved garden: {path.name}')
+
+    def toggle_timelapse(self):
+        """Start or stop capturing a time-lapse to the timelapses folder."""
+        if self.timelapse:
+            print(f'Saved time-lapse: {self.timelapse.frame} images in {self.timelapse.directory}')
+            self.timelapse = None
+        else:
+            directory = Path() / 'timelapses' / datetime.now().strftime("%a %b %d %Y %I.%M.%S %p")
+            # The window isn't kept drawn in terminal mode, so draw all of it on the next frame.
+            self.cell_screen.flip = True
+            self.timelapse = TimeLapse(self.capture, directory, self.timelapse_interval,
+                                       self.simulation.global_time)
 
-    @staticmethod
-    def terminate():
+    def terminate(self):
         """Quit pygame to be IDLE friendly and exit the program."""
+        # Finish saving the captured images and the export.
+        self.capture.close()
+        if self.export_thread and self.export_thread.is_alive():
+            print('Finishing the export...')
+            self.export_thread.join()
+        if self.stats_log is not None:
+            self.simulation.stats.write_log(self.stats_log)
+            print(f'Saved statistics log to {self.stats_log}')
+        if self.spectators:
+            self.spectators.close()
+        self.restore_terminal()
         pg.quit()
         sys.exit()
 
+    def restore_terminal(self):
+        """Give the terminal back to the shell. Safe to call more than once."""
+        if self.terminal_input:
+            self.terminal_input.close()
+            self.terminal_input = None
+        if self.terminal:
+            self.terminal.close()
+            self.terminal = None
+
+    def get_events(self) -> list[pg.event.Event]:
+        """Return the pending events, sleeping until the next one arrives when idle."""
+        if not self.idle:
+            return pg.event.get()
+        # Block until an event arrives, the next tick is due, or the timeout passes.
+        timeout = IDLE_TIMEOUT
+        # Wake up for the next step of a walk.
+        if self.player_path:
+            timeout = min(timeout, max(1, self.next_step_time - pg.time.get_ticks()))
+        if self.tick_clock:
+            # A timeout of zero would wait forever, so wait at least a millisecond.
+            timeout = min(timeout, max(1, int(self.tick_clock.time_until_tick() * 1000)))
+        event = pg.event.wait(timeout)
+        # Take the rest of the queue too.
+        if event.type == pg.NOEVENT:
+            return []
+        return [event, *pg.event.get()]
+
     def events(self):
-        for event in pg.event.get():
+        for event in self.get_events():
+            # Any input may change what is on the screen.
+            self.redraw = True
+
             if event.type == pg.QUIT:
                 self.terminate()
 
@@ -96,6 +294,12 @@ class Main:
                     self.debug = not self.debug
                 elif event.key == pg.K_F2:
                     self.screenshot()
+                elif event.key == pg.K_F3:
+                    self.toggle_timelapse()
+                elif event.key == pg.K_F4:
+                    self.export()
+                elif event.key == pg.K_F5:
+                    self.save()
 
                 elif event.key == pg.K_SPACE:
                     # Advance time.
@@ -111,7 +315,15 @@ class Main:
                     self.movement_key((1, 0), 1)
 
                 elif event.key == pg.K_z:
-                    self.handle_action_key()
+                    # Holding shift uses the item on the whole area shape.
+                    self.handle_action_key(bool(event.mod & pg.KMOD_SHIFT))
+                elif event.key == pg.K_u:
+                    self.undo()
+                elif event.key == pg.K_r:
+                    self.redo()
+                elif event.key == pg.K_a:
+                    # Cycle through the area shapes.
+                    self.area_shape = (self.area_shape + 1) % len(AREA_SHAPES)
 
                 elif event.key == pg.K_x:
                     # Open and close the inventory.
@@ -121,119 +333,235 @@ class Main:
                         self.draw_inventory()
                     else:
                         self.draw_play()
+                    self.show_status_layer()
 
                 elif event.key == pg.K_c:
                     # Toggle showing the plant statuses.
                     self.colors = not self.colors
-                    # Mark all plants for update.
-                    for pos in self.simulation.plants:
-                        self.simulation.updates.add(pos)
-
-    def handle_action_key(self):
-        """Handles all the action key logic."""
+                    self.show_status_layer()
+                elif event.key == pg.K_m:
+                    # Toggle showing the soil moisture.
+                    self.moisture_view = not self.moisture_view
+                    self.show_status_layer()
+                elif event.key == pg.K_TAB:
+                    # Toggle showing the minimap, redrawing the cells it covered when hidden.
+                    self.show_minimap = not self.show_minimap
+                    if not self.show_minimap:
+                        self.cell_screen.flip = True
+
+            elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and not self.inventory:
+                # Walk to the clicked cell.
+                self.walk_to(self.camera.to_world(self.cell_screen.get_cell_pos(event.pos)))
+
+    def handle_action_key(self, area: bool = False):
+        """Handles all the action key logic.
+        When area is True, the item is used on every tile of the current area shape at once."""
         # If in the inventory screen, exit it.
         if self.inventory:
             self.inventory = False
             self.draw_play()
+            self.show_status_layer()
         # Use the currently selected item.
         else:
-            # Get the affected tile's position.
-            tile_pos = vec_to_tuple(self.player_pos + Vector2(self.player_dir))
-            # Only perform an action if the position is on the screen.
-            if not self.cell_screen.cell_in_bounds(tile_pos):
+            # Get the affected tile positions.
+            if area:
+                points = sorted(self.get_area_points())
+            else:
+                points = [vec_to_tuple(self.player_pos + Vector2(self.player_dir))]
+            # Only perform an action on positions that are in the world.
+            points = [point for point in points if self.camera.in_world(point)]
+            if not points:
                 return
 
             item = self.player_inventory[self.current_item]
 
+            # Record the action so it can be undone.
+            self.history.begin(self.inventory_state())
             if isinstance(item, Seed):
-                # Make sure the space is clear.
-                if not self.simulation.plants.get(tile_pos, None):
-                    # Make sure the plant can be placed here.
-                    if self.simulation.grid[tile_pos[0]][tile_pos[1]] in item.valid_tiles:
-                        # Create a new plant.
-                        self.simulation.add_plant(tile_pos, *item)
-                        # Redraw the tiles that were covered by the previous display.
-                        self.clear_current_item()
-                        # Decrement the seed count.
-                        item.count -= 1
-                        # Delete the stack.
-                        if item.count == 0:
-                            del self.player_inventory[self.current_item]
-                            self.current_item = 0
-
+                self.plant_seeds(item, points)
             elif item.name == HOE:
-                # Harvest the plant.
-                if plant := self.simulation.plants.get(tile_pos, None):
-                    # Make the stacks stack nicely.
-                    for item in self.player_inventory:
-                        if item.name == plant.name:
-                            item.count += 4 if plant.done_growing else 1
-                            break
-                    else:
-                        self.player_inventory.append(Seed(*plant, count=4 if plant.done_growing else 1))
-                    # Remove the plant.
-                    self.simulation.remove_plant(plant)
-                # Toggle dirt and farmland.
-                else:
-                    tile = self.simulation.grid[tile_pos[0]][tile_pos[1]]
-                    if tile == 1:
-                        self.simulation.grid[tile_pos[0]][tile_pos[1]] = 2
-                    elif tile == 2:
-                        self.simulation.grid[tile_pos[0]][tile_pos[1]] = 1
-                    # Update the position.
-                    self.simulation.updates.add(tile_pos)
-
+                self.use_hoe(points)
             elif item.name == WATERING_CAN_EMPTY:
-                # Fill the bucket.
-                if self.simulation.grid[tile_pos[0]][tile_pos[1]] == 0:
-                    # Redraw the tiles that were covered by the previous display.
-                    self.clear_current_item()
-                    # Remove the empty watering can.
-                    del self.player_inventory[self.current_item]
-                    # Add the full watering can.
-                    self.player_inventory.insert(self.current_item, Item(WATERING_CAN_FULL))
-
+                self.fill_watering_can(points)
             elif item.name == WATERING_CAN_FULL:
-                # Water plants.
-                if plant := self.simulation.plants.get(tile_pos, None):
-                    # Free the plant to continue growing.
-                    plant.needs_water = False
-                    # Redraw the tiles that were covered by the previous display.
-                    self.clear_current_item()
-                    # Update for color status.
-                    self.simulation.updates.add(tile_pos)
-                    # Remove the full watering can.
-                    del self.player_inventory[self.current_item]
-                    # Add the empty watering can.
-                    self.player_inventory.insert(self.current_item, Item(WATERING_CAN_EMPTY))
+                self.water_plants(points)
+            self.history.commit(self.inventory_state())
 
-            # Advance time.
+            # Advance time once for the whole action.
             self.simulation.update_ticks()
 
+    def inventory_state(self) -> tuple:
+        """Returns the items, their counts, and the selected item, for the undo history."""
+        return tuple((item, getattr(item, "count", None)) for item in self.player_inventory), self.current_item
+
+    def restore_inventory_state(self, state: tuple):
+        """Put the inventory back the way it was in a state from inventory_state."""
+        # Redraw the tiles that were covered by the previous display.
+        self.clear_current_item()
+        items, self.current_item = state
+        self.player_inventory[:] = [item for item, count in items]
+        for item, count in items:
+            if count is not None:
+                item.count = count
+
+    def undo(self):
+        """Undo the last action."""
+        if not self.inventory and (state := self.history.undo()) is not None:
+            self.restore_inventory_state(state)
+
+    def redo(self):
+        """Redo the last undone action."""
+        if not self.inventory and (state := self.history.redo()) is not None:
+            self.restore_inventory_state(state)
+
+    def get_area_points(self) -> set[tuple[int, int]]:
+        """Returns the points of the current area shape in front of the player."""
+        tile_pos = vec_to_tuple(self.player_pos + Vector2(self.player_dir))
+        shape = AREA_SHAPES[self.area_shape]
+        # The rect and circle only move with the player, so their points come from cached templates.
+        if shape == "Rect":
+            return self.shapes.to_set(self.shapes.rect((tile_pos[0] - AREA_RADIUS, tile_pos[1] - AREA_RADIUS,
+                                                        AREA_RADIUS * 2 + 1, AREA_RADIUS * 2 + 1)))
+        elif shape == "Circle":
+            return self.shapes.to_set(self.shapes.circle(tile_pos, AREA_RADIUS + 0.5))
+        else:
+            end_pos = (tile_pos[0] + self.player_dir[0] * AREA_LENGTH,
+                       tile_pos[1] + self.player_dir[1] * AREA_LENGTH)
+            return set(bf.supercover_line(tile_pos, end_pos))
+
+    def plant_seeds(self, item: Seed, points: list[tuple[int, int]]):
+        """Plant seeds from the given stack on every clear and valid point."""
+        # Make sure the spaces are clear and the plant can be placed there, up to the seed count.
+        valid_tiles = self.simulation.species.valid[item.species]
+        positions = [pos for pos in points if pos not in self.simulation.plants and
+                     valid_tiles[self.simulation.grid[pos[0]][pos[1]]]][:item.count]
+        if not positions:
+            return
+        # Create the new plants.
+        for pos in positions:
+            self.simulation.add_plant(pos, item.species)
+        # Redraw the tiles that were covered by the previous display.
+        self.clear_current_item()
+        # Decrement the seed count.
+        item.count -= len(positions)
+        # Delete the stack.
+        if item.count == 0:
+            del self.player_inventory[self.current_item]
+            self.current_item = 0
+
+    def use_hoe(self, points: list[tuple[int, int]]):
+        """Harvest the plants on the given points and toggle dirt and farmland on the others."""
+        plants = self.simulation.plants_at(points)
+        harvested = {plant.pos for plant in plants}
+        # Harvest the plants.
+        for plant in plants:
+            # Make the stacks stack nicely.
+            for item in self.player_inventory:
+                if isinstance(item, Seed) and item.species == plant.species:
+                    item.count += 4 if plant.done_growing else 1
+                    break
+            else:
+                self.player_inventory.append(Seed(plant.species, count=4 if plant.done_growing else 1))
+            # Remove the plant.
+            self.simulation.remove_plant(plant)
+        # Toggle dirt and farmland.
+        for pos in points:
+            if pos in harvested:
+                continue
+            tile = self.simulation.grid[pos[0]][pos[1]]
+            if tile == 1:
+                self.simulation.set_tile(pos, 2)
+            elif tile == 2:
+                self.simulation.set_tile(pos, 1)
+
+    def fill_watering_can(self, points: list[tuple[int, int]]):
+        """Fill the watering can if any of the given points is water."""
+        if any(self.simulation.grid[pos[0]][pos[1]] == 0 for pos in points):
+            # Redraw the tiles that were covered by the previous display.
+            self.clear_current_item()
+            # Remove the empty watering can.
+            del self.player_inventory[self.current_item]
+            # Add the full watering can.
+            self.player_inventory.insert(self.current_item, Item(WATERING_CAN_FULL))
+
+    def water_plants(self, points: list[tuple[int, int]]):
+        """Water every plant on the given points with one full watering can."""
+        plants = self.simulation.plants_at(points)
+        if not plants:
+            return
+        for plant in plants:
+            # Free the plant to continue growing.
+            plant.water()
+        # Redraw the tiles that were covered by the previous display.
+        self.clear_current_item()
+        # Remove the full watering can.
+        del self.player_inventory[self.current_item]
+        # Add the empty watering can.
+        self.player_inventory.insert(self.current_item, Item(WATERING_CAN_EMPTY))
+
     def movement_key(self, pos_dir: tuple[int, int], inv_dir: int):
         """Handle the movement keys."""
         if self.inventory:
             self.move_inventory(inv_dir)
         else:
+            # Taking a step stops walking to a clicked cell.
+            self.player_path = []
             self.move_player(pos_dir)
 
     def move_player(self, direction: tuple[int, int]):
-        """Move the player in the given direction, staying on the screen."""
+        """Move the player in the given direction, staying in the world and out of the wanderers' way."""
         # Calculate the new position.
         new_pos = vec_to_tuple(self.player_pos + Vector2(direction))
 
-        # Only update if the position is on the screen.
-        if self.cell_screen.cell_in_bounds(new_pos):
+        # Only update if the position is in the world and free.
+        if self.camera.in_world(new_pos) and self.simulation.entities.reserve(new_pos):
             # Update the old position.
+            self.simulation.entities.release(vec_to_tuple(self.player_pos))
             self.simulation.updates.add(vec_to_tuple(self.player_pos))
             # Save the new position and direction.
             self.player_pos = Vector2(new_pos)
             self.player_dir = direction
+            # Keep the player in view.
+            self.follow_player()
             # Draw the player.
-            self.cell_screen.draw_cell(new_pos, PLAYER_TILES[self.player_dir])
+            self.cell_screen.draw_cell(self.camera.to_screen(new_pos), PLAYER_TILES[self.player_dir])
             # Advance time.
             self.simulation.update_ticks()
 
+    def walk_to(self, goal: tuple[int, int]):
+        """Start walking the player around the water and plants to a cell, one step every WALK_INTERVAL."""
+        path = self.simulation.paths.find_path(vec_to_tuple(self.player_pos), goal)
+        self.player_path = list(path or ())
+        self.next_step_time = pg.time.get_ticks()
+
+    def walk_step(self):
+        """Take the next step of the walk to a clicked cell, stopping if the way is blocked."""
+        old_pos = vec_to_tuple(self.player_pos)
+        x, y = self.player_path.pop(0)
+        self.move_player((x - old_pos[0], y - old_pos[1]))
+        # A wanderer got in the way.
+        if vec_to_tuple(self.player_pos) == old_pos:
+            self.player_path = []
+        self.next_step_time = pg.time.get_ticks() + WALK_INTERVAL
+
+    def follow_player(self):
+        """Scroll the screen to keep the player inside the margin of the camera.
+        The drawn cells are moved, so only the cells scrolled in are drawn."""
+        old_x, old_y = self.camera.x, self.camera.y
+        dx, dy = self.camera.follow(vec_to_tuple(self.player_pos))
+        if not (dx or dy):
+            return
+        # Put the world back under the current item display, so the text doesn't scroll along with it.
+        for x in range(len(self.player_inventory[self.current_item])):
+            self.draw_world_cell((old_x + x, old_y), (x, 0))
+        # Move the cells and layers the other way, and draw the world in the cells scrolled in.
+        for rect in self.cell_screen.scroll(-dx, -dy):
+            for x, y in np.ndindex(rect[2], rect[3]):
+                screen_pos = rect[0] + x, rect[1] + y
+                self.draw_world_cell(self.camera.to_world(screen_pos), screen_pos)
+        # The moisture heatmap shows a different part of the world now.
+        self.moisture_version = -1
+
     def move_inventory(self, direction: int):
         """Move the inventory cursor up and down, wrapping around."""
         self.current_item += direction
@@ -242,30 +570,36 @@ class Main:
 
     def update(self):
         """Update all structures and variables."""
+        # Walk to the clicked cell.
+        if self.player_path and pg.time.get_ticks() >= self.next_step_time:
+            self.walk_step()
+        # Let time pass on its own.
+        if self.tick_clock:
+            if ticks := self.tick_clock.advance():
+                self.simulation.update_ticks(ticks)
 
     def draw_play(self):
         """Draw the whole playing scene."""
-        # Draw the world.
-        for x in range(self.simulation.size[0]):
-            for y in range(self.simulation.size[1]):
-                self.cell_screen.draw_cell((x, y), GRID_TILES[self.simulation.grid[x][y]])
+        # Draw the part of the world in view.
+        for x in range(self.cell_screen.width):
+            for y in range(self.cell_screen.height):
+                self.cell_screen.draw_cell((x, y), self.grid_cell(self.camera.to_world((x, y))))
         # Draw the plants.
-        for pos, plant in self.simulation.plants.items():
-            status = None
-            if self.colors:
-                if plant.needs_water:
-                    status = (0, 0, 255)
-                if plant.done_growing:
-                    status = (0, 255, 0)
-            self.cell_screen.draw_cell(pos, (plant.tile[0], plant.tile[1], status))
+        for plant in self.simulation.plants_in_rect(self.camera.rect):
+            self.cell_screen.draw_cell(self.camera.to_screen(plant.pos), self.plant_cell(plant))
+            self.status_layer.draw_cell(self.camera.to_screen(plant.pos), self.plant_status(plant))
+        # Draw the wanderers in view.
+        x, y, w, h = self.camera.rect
+        for point in map(tuple, np.argwhere(self.simulation.entities.occupancy[x:x + w, y:y + h] >= 0).tolist()):
+            self.cell_screen.draw_cell(point, self.simulation.entities.cell_at(self.camera.to_world(point)))
         # Draw the player.
-        self.cell_screen.draw_cell(vec_to_tuple(self.player_pos), PLAYER_TILES[self.player_dir])
+        self.cell_screen.draw_cell(self.camera.to_screen(vec_to_tuple(self.player_pos)), PLAYER_TILES[self.player_dir])
 
     def clear_current_item(self):
         """Redraws the cells under the current item display."""
         # Redraw the tiles that were covered by the previous display.
         for x in range(len(self.player_inventory[self.current_item])):
-            self.simulation.updates.add((x, 0))
+            self.simulation.updates.add(self.camera.to_world((x, 0)))
 
     def draw_current_item(self):
         """Draw the currently selected item."""
@@ -288,26 +622,85 @@ class Main:
         # Draw the currently selected item.
         self.cell_screen.draw_cell((0, self.current_item), (0x10, (255, 255, 255), None))
 
+    def grid_cell(self, pos: tuple[int, int]) -> bf.surface.CellType:
+        """Returns the cell to draw the grid tile at a position with."""
+        tile = self.simulation.grid[pos[0]][pos[1]]
+        # The effects draw water with shades that shimmer separately.
+        if tile == 0 and self.effects:
+            return self.effects.water_cell(pos)
+        return GRID_TILES[tile]
+
+    def plant_cell(self, plant: Plant) -> bf.surface.CellType:
+        """Returns the cell to draw a plant with."""
+        table = self.simulation.species
+        return table.tiles[plant.species, plant.stage], table.colors[plant.species, plant.stage], (0, 0, 0)
+
+    @staticmethod
+    def plant_status(plant: Plant) -> tuple[int, int, int]:
+        """Returns the status color of a plant. Blue plants need water and green plants are done growing."""
+        if plant.done_growing:
+            return 0, 255, 0
+        if plant.needs_water:
+            return 0, 0, 255
+        return 0, 0, 0
+
+    def show_status_layer(self):
+        """Show the status layers that are toggled on while the inventory is closed."""
+        self.status_layer.enabled = self.colors and not self.inventory
+        self.moisture_layer.enabled = self.moisture_view and not self.inventory
+
+    def draw_moisture(self) -> bool:
+        """Redraw the moisture heatmap if it is shown and the moisture changed. Returns True if redrawn."""
+        if self.moisture_layer.enabled and self.moisture_version != self.simulation.moisture.version:
+            self.moisture_layer.fill_array(self.simulation.moisture.heatmap(self.camera.rect))
+            self.moisture_version = self.simulation.moisture.version
+            return True
+        return False
+
     def draw_simulation_cell(self, point: tuple[int, int]):
-        """Draw a single cell from the simulation to the screen."""
+        """Draw a single cell from the simulation to the screen, if it is in view."""
+        if self.camera.in_view(point):
+            self.draw_world_cell(point, self.camera.to_screen(point))
+
+    def draw_world_cell(self, point: tuple[int, int], screen_pos: tuple[int, int]):
+        """Draw the simulation cell at a world point on a screen cell."""
+        # Draw the wanderer if present, over whatever it stands on.
+        if cell := self.simulation.entities.cell_at(point):
+            self.cell_screen.draw_cell(screen_pos, cell)
+            self.status_layer.draw_cell(screen_pos, (0, 0, 0))
         # Draw the plant if present.
-        if plant := self.simulation.plants.get(point, None):
-            status = (0, 0, 0)
-            if self.colors:
-                if plant.needs_water:
-                    status = (0, 0, 255)
-                if plant.done_growing:
-                    status = (0, 255, 0)
-            self.cell_screen.draw_cell(point, (plant.tile[0], plant.tile[1], status))
+        elif plant := self.simulation.plants.get(point, None):
+            self.cell_screen.draw_cell(screen_pos, self.plant_cell(plant))
+            self.status_layer.draw_cell(screen_pos, self.plant_status(plant))
         # Draw the cell.
         else:
-            self.cell_screen.draw_cell(point, GRID_TILES[self.simulation.grid[point[0]][point[1]]])
+            self.cell_screen.draw_cell(screen_pos, self.grid_cell(point))
+            self.status_layer.draw_cell(screen_pos, (0, 0, 0))
 
     def draw(self):
         """Draw the main display surface."""
+        # Draw the moisture heatmap.
+        moisture_changed = self.draw_moisture()
+        # Light the screen for the time of day.
+        if self.effects:
+            self.cell_screen.set_palette(self.effects.colors(self.simulation.global_time, time.perf_counter()))
+        # When idle, skip the frame if there is nothing new to show.
+        if self.idle and not (self.redraw or moisture_changed or self.simulation.updates or
+                              self.cell_screen.points or self.cell_screen.flip or
+                              self.cell_screen.palette_changed):
+            self.clock.tick(self.frame_cap)
+            return
+        self.redraw = False
+
         # Draw the simulation.
         for point in self.simulation.updates:
             self.draw_simulation_cell(point)
+        # Draw the player back over its cell, such as after an area action changed it.
+        player_pos = vec_to_tuple(self.player_pos)
+        if player_pos in self.simulation.updates and self.camera.in_view(player_pos):
+            self.cell_screen.draw_cell(self.camera.to_screen(player_pos), PLAYER_TILES[self.player_dir])
+        # Keep the minimap up to date with the same cells.
+        self.minimap.update(self.simulation.updates)
         # Clear the simulation update list.
         self.simulation.updates = set()
 
@@ -315,8 +708,25 @@ class Main:
         if not self.inventory:
             self.draw_current_item()
 
+        # Send the changed cells to the spectators.
+        if self.spectators:
+            self.spectators.publish()
+
+        # In terminal mode, send the changed cells to the terminal.
+        if self.terminal:
+            self.terminal.render()
+            # Only draw the window when a time-lapse needs it, otherwise just clear the changed points.
+            if not self.timelapse:
+                bf.Surface.update(self.cell_screen)
+                self.clock.tick(self.frame_cap)
+                return
+
         # Update the surf.
         self.cell_screen.update(self.screen)
+        # Show the minimap in the top right corner.
+        if self.show_minimap:
+            self.minimap.draw(self.screen, (self.screen.get_width() - self.minimap.image.get_width() - 4, 4),
+                              vec_to_tuple(self.player_pos), self.camera.rect)
         # Show FPS.
         if self.debug:
             self.screen.blit(self.debug_font.render(f'{self.clock.get_fps():.2f}',
@@ -325,9 +735,15 @@ class Main:
                                                     False, (255, 255, 255), (0, 0, 0)), (0, 585))
             self.screen.blit(self.debug_font.render(f'C: {int(self.colors)}',
                                                     False, (255, 255, 255), (0, 0, 0)), (0, 570))
+            self.screen.blit(self.debug_font.render(f'A: {AREA_SHAPES[self.area_shape]:<6}',
+                                                    False, (255, 255, 255), (0, 0, 0)), (0, 555))
+            # The plant counts are kept by the simulation, so showing them every frame costs nothing.
+            stats = self.simulation.stats
+            self.screen.blit(self.debug_font.render(f'P: {stats.plants()} W: {stats.thirsty()} G: {stats.grown()}',
+                                                    False, (255, 255, 255), (0, 0, 0)), (0, 540))
         # Tick clock for timing and flip the display.
         pg.display.flip()
-        self.clock.tick()
+        self.clock.tick(self.frame_cap)
 
     def run(self):
         """The function with the main loop of the application."""
@@ -335,12 +751,89 @@ class Main:
             self.events()
             self.update()
             self.draw()
+            # Capture the time-lapse from the finished frame.
+            if self.timelapse:
+                self.timelapse.update(self.screen, self.simulation.global_time)
+
+
+def world_size(text: str) -> tuple[int, int]:
+    """Parses a world size given as WxH, such as 200x150. The world must be at least as big as the screen."""
+    try:
+        width, height = (int(side) for side in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"world size must look like 200x150, not {text!r}")
+    # The camera can't show less than a whole screen of cells.
+    min_width, min_height = SCREEN_SIZE[0] // CELL_SIZE[0], SCREEN_SIZE[1] // CELL_SIZE[1]
+    if width < min_width or height < min_height:
+        raise argparse.ArgumentTypeError(f"world size must be at least the screen, {min_width}x{min_height}, "
+                                         f"not {width}x{height}")
+    return width, height
+
+
+def entity_count(text: str) -> int:
+    """Parses how many wanderers of a kind to add, which can't be negative."""
+    try:
+        count = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"count must be a whole number, not {text!r}")
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"count can't be negative, not {count}")
+    return count
 
 
 def main():
+    parser = argparse.ArgumentParser(description="A zen gardening simulator.")
+    parser.add_argument("--idle", action="store_true",
+                        help="sleep until input arrives and only draw frames that changed")
+    parser.add_argument("--fps", type=int, default=0, help="frame rate cap, 0 for no cap")
+    parser.add_argument("--tick-rate", type=float, default=0,
+                        help="simulation ticks per second of real time, 0 to only pass time on input")
+    parser.add_argument("--max-catchup", type=int, default=10,
+                        help="most ticks to run at once after a slow frame")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a repeatable garden and terrain")
+    parser.add_argument("--timelapse-interval", type=int, default=10,
+                        help="simulation ticks between time-lapse images")
+    parser.add_argument("--species", type=Path, action="append", default=[],
+                        help="JSON file of extra plant species to load, can be given more than once")
+    parser.add_argument("--terminal", action="store_true",
+                        help="draw the garden on the terminal with ANSI colors instead of a window")
+    parser.add_argument("--spectate", type=int, default=None, metavar="PORT",
+                        help="stream the garden to viewers started with spectate.py on a local port")
+    parser.add_argument("--load", type=Path, default=None, help="saved garden to open, made with F5")
+    parser.add_argument("--world", type=world_size, default=None, metavar="WxH",
+                        help="size of a new garden in cells, bigger than the screen to scroll around it")
+    parser.add_argument("--effects", action="store_true",
+                        help="change the light between day and night and make the water shimmer")
+    parser.add_argument("--gardeners", type=entity_count, default=0, help="number of gardeners wandering the garden")
+    parser.add_argument("--rabbits", type=entity_count, default=0, help="number of rabbits wandering the garden")
+    parser.add_argument("--stats-log", type=Path, default=None, metavar="FILE",
+                        help="CSV file to write the plant counts over time to on exit")
+    parser.add_argument("--stats-interval", type=int, default=LOG_INTERVAL,
+                        help="simulation ticks between the rows of the statistics log")
+    args = parser.parse_args()
+
+    # Load the extra plant species.
+    for path in args.species:
+        SPECIES.load(path)
+
+    # The terminal needs no window, so don't open a real one.
+    if args.terminal:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
     pg.init()
     pg.key.set_repeat(500, 100)
-    Main().run()
+    app = Main(idle=args.idle, frame_cap=args.fps, tick_rate=args.tick_rate, max_catchup=args.max_catchup,
+               seed=args.seed, timelapse_interval=args.timelapse_interval, terminal=args.terminal,
+               spectate_port=args.spectate, load=args.load, effects=args.effects, world=args.world,
+               gardeners=args.gardeners, rabbits=args.rabbits, stats_log=args.stats_log,
+               stats_interval=args.stats_interval)
+    try:
+        app.run()
+    except KeyboardInterrupt:
+        # Ctrl+C is the way to quit from a terminal.
+        app.terminate()
+    finally:
+        # Never leave the shell in the game's screen, whatever stopped the game.
+        app.restore_terminal()
 
 
 if __name__ == "__main__":
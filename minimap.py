@@ -0,0 +1,113 @@
+"""This file holds the minimap that shows an overview of the whole garden."""
+
+# Description:
+#   The following class Minimap is used to show the whole world shrunk down in a corner of the screen.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only tells it which cells changed and where to draw it.
+#   This class uses encapsulation because it holds the cell colors, the block sums, and the image
+#   together with the functions that keep them up to date.
+
+from typing import Iterable
+
+import numpy as np
+import pygame as pg
+
+from simulation import Simulation, GRID_TILES
+
+# Colors of the grid tiles on the minimap, indexed by tile value.
+TILE_COLORS = np.array([GRID_TILES[tile][1] for tile in range(len(GRID_TILES))], np.int32)
+# Farmland has the same color as dirt on the screen, so make it darker on the minimap to tell them apart.
+TILE_COLORS[2] //= 2
+# Pixel size the minimap is kept to by default, by using bigger blocks for bigger worlds.
+MAX_SIZE = (100, 75)
+
+
+class Minimap:
+    """Low resolution image of the world, where every pixel is the mean color of a block of cells.
+    The sums of the blocks are kept, so changing a cell only updates its own block."""
+    def __init__(self, simulation: Simulation, block: int = None, scale: int = 3):
+        """Create a minimap of a simulation, with a pixel for every block by block cells,
+        shown scale times bigger. The block defaults to the smallest one keeping the minimap about MAX_SIZE."""
+        self.simulation = simulation
+        width, height = simulation.size
+        if block is None:
+            block = max(-(-width * scale // MAX_SIZE[0]), -(-height * scale // MAX_SIZE[1]), 1)
+        self.block = block
+        self.scale = scale
+        # The size in blocks, counting the partial blocks at the edges.
+        self.size = -(-width // block), -(-height // block)
+        # Color of every cell, and the sum of the colors of every block.
+        self.cell_colors = np.zeros((width, height, 3), np.int32)
+        self.block_sums = np.zeros((*self.size, 3), np.int32)
+        # Number of cells in every block, less at the right and bottom edges.
+        self.block_counts = np.zeros(self.size, np.int32)
+        np.add.at(self.block_counts, (np.arange(width)[:, None] // block, np.arange(height)[None, :] // block), 1)
+        # The image of the minimap, already scaled up.
+        self.image = pg.Surface((self.size[0] * scale, self.size[1] * scale)).convert()
+        self.rebuild()
+
+    def colors_at(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Returns the minimap colors of the cells at the given x and y arrays."""
+        colors = TILE_COLORS[self.simulation.grid[xs, ys]]
+        # Plants cover the ground they grow on.
+        species = self.simulation.species
+        for index in np.flatnonzero(self.simulation.plant_species[xs, ys] >= 0).tolist():
+            plant = self.simulation.plants[int(xs[index]), int(ys[index])]
+            colors[index] = species.colors[plant.species, plant.stage]
+        return colors
+
+    def rebuild(self):
+        """Work out every cell and block again and redraw the whole image."""
+        width, height = self.simulation.size
+        xs, ys = np.indices((width, height)).reshape(2, -1)
+        self.cell_colors[xs, ys] = self.colors_at(xs, ys)
+        # Sum the blocks by padding the cells to whole blocks and reducing over each block.
+        padded = np.zeros((self.size[0] * self.block, self.size[1] * self.block, 3), np.int32)
+        padded[:width, :height] = self.cell_colors
+        self.block_sums = padded.reshape(self.size[0], self.block, self.size[1], self.block, 3).sum((1, 3))
+        # Draw all the blocks at once, scaled up in a single call.
+        image = pg.surfarray.make_surface(self.block_means())
+        self.image.blit(pg.transform.scale(image, self.image.get_size()), (0, 0))
+
+    def block_means(self, bxs: np.ndarray = None, bys: np.ndarray = None) -> np.ndarray:
+        """Returns the mean colors of the blocks at the given x and y arrays, defaults to all blocks."""
+        if bxs is None:
+            return (self.block_sums // self.block_counts[..., None]).astype(np.uint8)
+        return (self.block_sums[bxs, bys] // self.block_counts[bxs, bys][:, None]).astype(np.uint8)
+
+    def update(self, points: Iterable[tuple[int, int]]):
+        """Update the minimap for the cells that changed. Only the blocks of those cells are redrawn."""
+        if not points:
+            return
+        xs, ys = np.array(list(points)).reshape(-1, 2).T
+        colors = self.colors_at(xs, ys)
+        # Move the block sums by how much each cell changed.
+        bxs, bys = xs // self.block, ys // self.block
+        np.add.at(self.block_sums, (bxs, bys), colors - self.cell_colors[xs, ys])
+        self.cell_colors[xs, ys] = colors
+        # Redraw every changed block once.
+        bxs, bys = np.unique(np.stack((bxs, bys)), axis=1)
+        for bx, by, color in zip(bxs.tolist(), bys.tolist(), self.block_means(bxs, bys).tolist()):
+            self.image.fill(color, (bx * self.scale, by * self.scale, self.scale, self.scale))
+
+    def draw(self, surf: pg.Surface, pos: tuple[int, int], marker: tuple[int, int] = None,
+             view: tuple[int, int, int, int] = None):
+        """Draw the minimap on a surface with its top left corner at pos.
+        The marker is a cell to show in white, such as the player. The view is a rect of cells to outline,
+        such as the part of the world on the screen, which isn't outlined when it is the whole world."""
+        surf.blit(self.image, pos)
+        if view is not None and tuple(view[2:]) != tuple(self.simulation.size):
+            pg.draw.rect(surf, (255, 255, 0), (pos[0] + view[0] * self.scale // self.block,
+                                               pos[1] + view[1] * self.scale // self.block,
+                                               view[2] * self.scale // self.block,
+                                               view[3] * self.scale // self.block), 1)
+        if marker is not None:
+            surf.fill((255, 255, 255), (pos[0] + marker[0] // self.block * self.scale,
+                                        pos[1] + marker[1] // self.block * self.scale, self.scale, self.scale))
+        # Outline the minimap so it stands apart from the garden.
+        width, height = self.image.get_size()
+        pg.draw.rect(surf, (128, 128, 128), (pos[0] - 1, pos[1] - 1, width + 2, height + 2), 1)
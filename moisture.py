@@ -0,0 +1,80 @@
+"""This file holds the soil moisture field that waters the plants."""
+
+# Description:
+#   The following class MoistureField is used to spread water from the lake through the soil.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the rest of the game only reads how wet a cell is.
+#   This class uses encapsulation because it holds both the moisture of every cell and the function
+#   that diffuses it over time.
+
+import numpy as np
+
+# How easily water flows through each grid tile, indexed by tile value.
+# Water is handled separately since it is always full.
+CONDUCTIVITY = np.array([1.0, 0.25, 1.0], np.float32)
+# Fraction of moisture lost to the air each tick, indexed by tile value. Farmland holds water longer.
+DECAY = np.array([0.0, 0.02, 0.005], np.float32)
+# Rate of diffusion between neighboring cells. Must stay at or below 0.25 to be stable.
+DIFFUSION_RATE = 0.2
+# Moisture a thirsty plant needs under it to drink, and how much it drinks.
+DRINK_THRESHOLD = 0.3
+DRINK_AMOUNT = 0.25
+# Most diffusion steps run in a single update, so catching up on lots of ticks stays cheap.
+MAX_STEPS = 8
+
+
+class MoistureField:
+    """Per cell soil moisture from 0 to 1, diffusing outward from water tiles."""
+    def __init__(self, size: tuple[int, int]):
+        """Create a completely dry field of the given size."""
+        self.size = size
+        # The moisture of every cell.
+        self.moisture = np.zeros(size, np.float32)
+        # Scratch array for the neighbor sums, reused every step.
+        self._flow = np.zeros(size, np.float32)
+        # Counts the steps taken, so views know when to redraw.
+        self.version = 0
+
+    def step(self, grid: np.ndarray, ticks: int = 1):
+        """Diffuse and evaporate the moisture for the given amount of ticks over the tile grid."""
+        # Look up the tile properties of every cell once per update.
+        water = grid == 0
+        conductivity = CONDUCTIVITY[grid] * DIFFUSION_RATE
+        keep = 1 - DECAY[grid]
+        m, flow = self.moisture, self._flow
+        for _ in range(min(ticks, MAX_STEPS)):
+            # Water tiles are always full.
+            m[water] = 1
+            # Sum the difference to the four orthogonal neighbors. Edges don't lose water.
+            flow.fill(0)
+            flow[1:] += m[:-1] - m[1:]
+            flow[:-1] += m[1:] - m[:-1]
+            flow[:, 1:] += m[:, :-1] - m[:, 1:]
+            flow[:, :-1] += m[:, 1:] - m[:, :-1]
+            # Move water along the soil, then let some of it evaporate.
+            flow *= conductivity
+            m += flow
+            m *= keep
+        m[water] = 1
+        self.version += 1
+
+    def drink(self, pos: tuple[int, int]) -> bool:
+        """Let a plant drink from the cell it stands on. Returns True if there was enough water."""
+        if self.moisture[pos] < DRINK_THRESHOLD:
+            return False
+        self.moisture[pos] -= DRINK_AMOUNT
+        return True
+
+    def heatmap(self, rect: tuple[int, int, int, int] = None) -> np.ndarray:
+        """Returns a (w, h, 3) color array of the moisture in the rect (x, y, w, h), black where dry.
+        The rect defaults to the whole field."""
+        x, y, w, h = rect or (0, 0, *self.size)
+        moisture = self.moisture[x:x + w, y:y + h]
+        colors = np.zeros((*moisture.shape, 3), np.uint8)
+        colors[..., 1] = moisture * 128
+        colors[..., 2] = moisture * 255
+        return colors
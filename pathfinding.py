@@ -0,0 +1,207 @@
+"""This file holds the pathfinding that finds ways around the water and plants of the garden."""
+
+# Description:
+#   The following class Pathfinder is used to find paths on the grid of a simulation and remember them.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because callers only ask for a path or a flow field, not how they are searched
+#   for or when they have to be searched for again.
+#   This class uses encapsulation because it holds the cells that can be walked on, the cached paths, and the
+#   cached flow fields, along with the functions that keep them up to date as the garden changes.
+
+import heapq
+from collections import OrderedDict
+from typing import Callable, Hashable, Union
+
+import numpy as np
+
+from entities import DIRECTIONS
+
+# Most paths a Pathfinder remembers by default before it forgets the least recently used one.
+MAX_PATHS = 128
+# Distance given to unreachable cells when following a flow field, further than any reachable cell.
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+class Pathfinder:
+    """A* paths and flow fields over the cells of a simulation that are neither water nor plants.
+    Paths are cached until a change to the garden could make them blocked or longer than needed,
+    and flow fields are cached until any cell changes between walkable and not."""
+    def __init__(self, simulation, max_paths: int = MAX_PATHS):
+        """Create a pathfinder for a simulation, remembering at most max_paths paths.
+        The simulation tells it about every changed cell with changed."""
+        self.simulation = simulation
+        self.max_paths = max_paths
+        # Whether every cell can be walked on, as an array and as a flat list for the search.
+        # They are made on first use, so the terrain can be filled in after the simulation is made.
+        self.passable: Union[np.ndarray, None] = None
+        self.passable_list: Union[list[bool], None] = None
+        # Counts the changes to the walkable cells, to tell when a flow field is out of date.
+        self.version = 0
+        # Paths from start to goal, ordered from least to most recently used, with the cells of each path.
+        # None is cached for goals that can't be reached.
+        self.paths: OrderedDict[tuple, Union[tuple[tuple[int, int], ...], None]] = OrderedDict()
+        self.path_cells: dict[tuple, set[tuple[int, int]]] = {}
+        # Flow fields with the version they were made at.
+        self.fields: dict[Hashable, tuple[int, np.ndarray]] = {}
+        # Statistics of the path lookups.
+        self.hits = 0
+        self.misses = 0
+
+    def walkable(self) -> np.ndarray:
+        """Returns the array of whether every cell can be walked on, making it on first use."""
+        if self.passable is None:
+            self.passable = (self.simulation.grid != 0) & (self.simulation.plant_species < 0)
+            self.passable_list = self.passable.ravel().tolist()
+        return self.passable
+
+    def changed(self, pos: tuple[int, int]):
+        """Tell the pathfinder a cell changed. Forgets the paths that could be different now."""
+        if self.passable is None:
+            return
+        passable = bool(self.simulation.grid[pos] != 0 and self.simulation.plant_species[pos] < 0)
+        if passable == self.passable[pos]:
+            return
+        self.passable[pos] = passable
+        self.passable_list[pos[0] * self.simulation.size[1] + pos[1]] = passable
+        self.version += 1
+        for key in list(self.paths):
+            path = self.paths[key]
+            if passable:
+                # A new opening can only shorten paths that would be shorter going through it,
+                # but any unreachable goal could be reachable now.
+                start, goal = key
+                if path is not None and (abs(start[0] - pos[0]) + abs(start[1] - pos[1]) +
+                                         abs(goal[0] - pos[0]) + abs(goal[1] - pos[1])) >= len(path):
+                    continue
+            # A new wall only blocks the paths going through it.
+            elif path is None or pos not in self.path_cells[key]:
+                continue
+            self.forget(key)
+
+    def forget(self, key: tuple):
+        """Forget a cached path."""
+        del self.paths[key]
+        self.path_cells.pop(key, None)
+
+    def clear(self):
+        """Forget all paths and flow fields. The statistics are kept."""
+        self.paths.clear()
+        self.path_cells.clear()
+        self.fields.clear()
+
+    def find_path(self, start: tuple[int, int], goal: tuple[int, int]) -> Union[tuple[tuple[int, int], ...], None]:
+        """Returns the shortest path of orthogonal steps from start to goal, not counting the start,
+        or None if there is none. The start and goal can be any cells, only the cells between them
+        have to be walkable, so paths can lead up to a plant."""
+        key = start, goal
+        if key in self.paths:
+            self.hits += 1
+            self.paths.move_to_end(key)
+            return self.paths[key]
+        self.misses += 1
+        path = self.search(start, goal)
+        self.paths[key] = path
+        if path is not None:
+            self.path_cells[key] = set(path)
+        # Forget the least recently used path when full.
+        if len(self.paths) > self.max_paths:
+            self.forget(next(iter(self.paths)))
+        return path
+
+    def search(self, start: tuple[int, int], goal: tuple[int, int]) -> Union[tuple[tuple[int, int], ...], None]:
+        """Returns the shortest path from start to goal found with A*, without using the cache."""
+        self.walkable()
+        passable = self.passable_list
+        width, height = self.simulation.size
+        if start == goal:
+            return ()
+        # Cells are numbered like the flat grid, so the search only handles integers.
+        first, last = start[0] * height + start[1], goal[0] * height + goal[1]
+        gx, gy = goal
+        costs = {first: 0}
+        came_from = {first: -1}
+        # Ties go to the cell closest to the goal, which finds straight paths with fewer steps.
+        heuristic = abs(start[0] - gx) + abs(start[1] - gy)
+        frontier = [(heuristic, heuristic, first)]
+        while frontier:
+            _, _, cell = heapq.heappop(frontier)
+            if cell == last:
+                break
+            x, y = divmod(cell, height)
+            cost = costs[cell] + 1
+            for nx, ny, neighbor in ((x + 1, y, cell + height), (x - 1, y, cell - height),
+                                     (x, y - 1, cell - 1), (x, y + 1, cell + 1)):
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                if neighbor != last and not passable[neighbor]:
+                    continue
+                if cost < costs.get(neighbor, cost + 1):
+                    costs[neighbor] = cost
+                    came_from[neighbor] = cell
+                    distance = abs(nx - gx) + abs(ny - gy)
+                    heapq.heappush(frontier, (cost + distance, distance, neighbor))
+        else:
+            return None
+        # Walk back from the goal to the start.
+        path = []
+        cell = last
+        while cell != first:
+            path.append(divmod(cell, height))
+            cell = came_from[cell]
+        return tuple(reversed(path))
+
+    def flow_field(self, key: Hashable, make_targets: Callable[[], np.ndarray]) -> np.ndarray:
+        """Returns the flow field stored under key, the number of steps from every cell to the closest target,
+        -1 where no target can be reached. The field is made again from the bool array of target cells
+        returned by make_targets whenever the walkable cells changed since it was made."""
+        self.walkable()
+        version, field = self.fields.get(key, (None, None))
+        if version != self.version:
+            field = self.wavefront(make_targets())
+            field.flags.writeable = False
+            self.fields[key] = self.version, field
+        return field
+
+    def water_field(self) -> np.ndarray:
+        """Returns the flow field toward the water, which every gardener can share."""
+        return self.flow_field("water", lambda: self.simulation.grid == 0)
+
+    def wavefront(self, targets: np.ndarray) -> np.ndarray:
+        """Returns the steps from every cell to the closest target cell, spreading out from all targets at once.
+        The targets don't have to be walkable, such as water."""
+        distances = np.full(self.simulation.size, -1, np.int32)
+        distances[targets] = 0
+        unvisited = self.walkable() & ~targets
+        front = targets.copy()
+        steps = 0
+        while front.any():
+            steps += 1
+            # Spread the front to the orthogonal neighbors that haven't been reached yet.
+            grown = np.zeros_like(front)
+            grown[1:] |= front[:-1]
+            grown[:-1] |= front[1:]
+            grown[:, 1:] |= front[:, :-1]
+            grown[:, :-1] |= front[:, 1:]
+            front = grown & unvisited
+            unvisited &= ~front
+            distances[front] = steps
+        return distances
+
+    @staticmethod
+    def follow(field: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Returns the (N, 2) directions that take an (N, 2) array of positions one step down a flow field.
+        Positions at a target or with no way closer get (0, 0)."""
+        positions = np.asarray(positions).reshape(-1, 2)
+        # Pad the field with unreachable cells, so the edges need no checks.
+        padded = np.pad(np.where(field < 0, UNREACHABLE, field), 1, constant_values=UNREACHABLE)
+        xs, ys = positions[:, 0] + 1, positions[:, 1] + 1
+        neighbors = padded[xs[:, None] + DIRECTIONS[:, 0], ys[:, None] + DIRECTIONS[:, 1]]
+        best = neighbors.argmin(axis=1)
+        directions = DIRECTIONS[best]
+        # Stay put unless the best neighbor is closer.
+        directions[neighbors[np.arange(len(best)), best] >= padded[xs, ys]] = 0
+        return directions
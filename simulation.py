@@ -24,8 +24,33 @@
 #   This class uses encapsulation because it holds both world data and some useful functions to add
 #   plants, remove plants, and update the world by a certain amount of time.
 
+# Description:
+#   The following class TickClock is used to advance the simulation on its own at a fixed rate.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because callers only ask how many ticks are due, not how time is measured.
+#   This class uses encapsulation because it holds the leftover time between calls along with the
+#   function that turns elapsed time into ticks.
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy as np
 from pygame.math import Vector2
 
+from entities import Entities
+from moisture import MoistureField
+from pathfinding import Pathfinder
+from spatial import SpatialIndex
+from species import SpeciesRegistry
+from stats import GardenStats
+
 PLAYER_TILES = {
     (1, 0): (0x10, (255, 255, 255), None),
     (-1, 0): (0x11, (255, 255, 255), None),
@@ -50,88 +75,279 @@ def vec_to_tuple(x: Vector2) -> tuple[int, int]:
 
 
 class Plant:
-    def __init__(self, simulation: "Simulation", pos: tuple[int, int],
-                 name: str, valid_tiles: tuple[int, ...], stages: list[dict]):
+    def __init__(self, simulation: "Simulation", pos: tuple[int, int], species: int):
         self.simulation = simulation
         self.pos = pos
 
         # Seed data.
-        self.name = name
-        self.valid_tiles = valid_tiles
-        self.stages = stages
+        self.species = species
 
         # Other instance variables.
-        self.done_growing = False
+        table = self.simulation.species
         self.stage = 0
-        self.tile = self.stages[self.stage]["tile"]
+        self.done_growing = bool(table.stage_counts[species] == 1)
         self.last_time = self.simulation.global_time
-        self.needs_water = self.stages[self.stage].get("water", False)
-
-    def __getitem__(self, item):
-        """Convenience method for unpacking the data."""
-        if item == 0:
-            return self.name
-        elif item == 1:
-            return self.valid_tiles
-        elif item == 2:
-            return self.stages
-        else:
-            raise IndexError("Valid items are 0, 1, and 2.")
+        self.needs_water = bool(table.water[species, self.stage])
+
+    @property
+    def name(self) -> str:
+        """The name of the plant species."""
+        return self.simulation.species.names[self.species]
+
+    def water(self):
+        """Free the plant to continue growing."""
+        self.simulation.record("water", self, self.stage, self.needs_water)
+        self.simulation.stats.count(self, -1)
+        self.needs_water = False
+        self.simulation.stats.count(self)
+        # Update for color status.
+        self.simulation.updates.add(self.pos)
 
     def update(self):
         """Update the plant."""
         if self.done_growing:
             return
 
+        # Drink from the soil if it is wet enough.
+        if self.needs_water and self.simulation.moisture.drink(self.pos):
+            self.water()
+
         # Don't grow until watered.
         if self.needs_water:
             self.last_time = self.simulation.global_time
 
-        if self.simulation.global_time - self.last_time > self.stages[self.stage]["time"]:
+        table = self.simulation.species
+        if self.simulation.global_time - self.last_time > table.durations[self.species, self.stage]:
             # Update the simulation.
             self.simulation.updates.add(self.pos)
+            self.simulation.stats.count(self, -1)
             # Update the variables.
             self.stage += 1
-            self.tile = self.tile if (new_tile := self.stages[self.stage].get("tile", None)) is None \
-                else new_tile
             self.last_time = self.simulation.global_time
-            self.needs_water = self.stages[self.stage].get("water", False)
+            self.needs_water = bool(table.water[self.species, self.stage])
 
             # Make the plant stop growing.
-            if self.stage == len(self.stages) - 1:
+            if self.stage == table.stage_counts[self.species] - 1:
                 self.done_growing = True
-                return
+                self.simulation.mature[self.pos] = True
+            self.simulation.stats.count(self)
 
 
 class Simulation:
     """The simulation class for the Cell Engine."""
-    def __init__(self, size: tuple[int, int]):
-        """Create an empty simulation of a given size."""
+    def __init__(self, size: tuple[int, int], species: SpeciesRegistry, seed: int = None):
+        """Create an empty simulation of a given size, growing plants from the given species.
+        The seed makes the random parts of the simulation repeat exactly."""
         # The size of the simulation.
         self.size = size
+        # Lookup tables for all the plant species.
+        self.species = species
         # Quick lookup of plants based on position.
         self.plants: dict[tuple[int, int], Plant] = {}
-        # Store the grid data in a 2d list.
-        self.grid = [[0 for _ in range(size[1])] for _ in range(size[0])]
+        # Lookup of plants by area, kept in sync with self.plants.
+        self.plant_index = SpatialIndex()
+        # Species id of the plant in every cell, -1 where empty, and whether it is done growing.
+        self.plant_species = np.full(size, -1, np.int16)
+        self.mature = np.zeros(size, np.bool_)
+        # Store the grid data in a 2d array.
+        self.grid = np.zeros(size, np.uint8)
+        # The soil moisture of every cell.
+        self.moisture = MoistureField(size)
+        # The gardeners and animals wandering around.
+        self.entities = Entities(size)
+        # Paths around the water and plants, told about every cell that changes.
+        self.paths = Pathfinder(self)
+        # Counts of the plants by species, stage, and status.
+        self.stats = GardenStats(species)
         # Set of all cells that changed since last time.
         self.updates = set()
         # The global time.
         self.global_time = 0
+        # Random number generator for plants spreading.
+        self.rng = np.random.default_rng(seed)
+        # List of reversible changes being recorded, or None when not recording.
+        self.journal: Union[list[tuple], None] = None
+
+    def record(self, *change):
+        """Record a reversible change to the journal, if one is being kept."""
+        if self.journal is not None:
+            self.journal.append(change)
 
-    def add_plant(self, pos: tuple[int, int],
-                  name: str, valid_tiles: tuple[int, ...], stages: list[dict]):
-        """Add a plant to the world."""
-        self.plants[pos] = Plant(self, pos, name, valid_tiles, stages)
+    def set_tile(self, pos: tuple[int, int], tile: int):
+        """Change the grid tile at a position."""
+        self.record("tile", pos, int(self.grid[pos]), tile)
+        self.grid[pos] = tile
         self.updates.add(pos)
+        self.paths.changed(pos)
+
+    def add_plant(self, pos: tuple[int, int], species: int):
+        """Add a plant of the given species to the world."""
+        self.insert_plant(Plant(self, pos, species))
 
     def remove_plant(self, plant: Plant):
         """Remove a plant from the world."""
+        self.record("remove", plant)
+        self.stats.count(plant, -1)
         del self.plants[plant.pos]
+        self.plant_index.remove(plant.pos)
+        self.plant_species[plant.pos] = -1
+        self.mature[plant.pos] = False
         self.updates.add(plant.pos)
+        self.paths.changed(plant.pos)
+
+    def insert_plant(self, plant: Plant):
+        """Put an existing plant into the world at its position."""
+        self.record("insert", plant)
+        self.stats.count(plant)
+        self.plants[plant.pos] = plant
+        self.plant_index.insert(plant.pos, plant)
+        self.plant_species[plant.pos] = plant.species
+        self.mature[plant.pos] = plant.done_growing
+        self.updates.add(plant.pos)
+        self.paths.changed(plant.pos)
+
+    def plants_in_rect(self, rect: tuple[int, int, int, int]) -> list[Plant]:
+        """Returns the plants inside the rect (x, y, w, h)."""
+        return self.plant_index.query_rect(rect)
+
+    def plants_in_circle(self, center: tuple[float, float], radius: float) -> list[Plant]:
+        """Returns the plants inside the circle."""
+        return self.plant_index.query_circle(center, radius)
+
+    def plants_at(self, points: Iterable[tuple[int, int]]) -> list[Plant]:
+        """Returns the plants at any of the given points."""
+        return self.plant_index.query_points(points)
+
+    def save(self, path: Path):
+        """Save the simulation to a compressed NumPy .npz file at path."""
+        plants = list(self.plants.values())
+        # Write a temporary file first, so an interrupted save never ruins the last one.
+        temporary = Path(path).with_name(Path(path).name + '.tmp')
+        with open(temporary, 'wb') as file:
+            self._save_arrays(file, plants)
+        os.replace(temporary, path)
+
+    def _save_arrays(self, file, plants: list[Plant]):
+        """Write the arrays of the simulation and the given plants to an open file."""
+        np.savez_compressed(
+            file,
+            grid=self.grid,
+            moisture=self.moisture.moisture,
+            global_time=np.int64(self.global_time),
+            rng_state=json.dumps(self.rng.bit_generator.state),
+            # Species are saved by name, so the file loads even if the ids change.
+            species_names=np.array(self.species.names, np.str_),
+            plant_pos=np.array([plant.pos for plant in plants], np.int32).reshape(-1, 2),
+            plant_species=np.array([plant.species for plant in plants], np.int16),
+            plant_stage=np.array([plant.stage for plant in plants], np.int16),
+            plant_last_time=np.array([plant.last_time for plant in plants], np.int64),
+            plant_needs_water=np.array([plant.needs_water for plant in plants], np.bool_),
+            entity_pos=self.entities.positions[:len(self.entities)],
+            entity_dir=self.entities.directions[:len(self.entities)],
+            entity_kind=self.entities.kinds[:len(self.entities)],
+        )
+
+    @classmethod
+    def load(cls, path: Path, species: SpeciesRegistry) -> "Simulation":
+        """Returns the simulation saved at path, growing plants from the given species.
+        Every species in the file must be registered, unknown names raise a KeyError."""
+        with np.load(path) as data:
+            simulation = cls(data["grid"].shape, species)
+            simulation.grid[...] = data["grid"]
+            simulation.moisture.moisture[...] = data["moisture"]
+            simulation.global_time = int(data["global_time"])
+            simulation.rng.bit_generator.state = json.loads(str(data["rng_state"]))
+            # Turn the saved species ids into ids of this registry.
+            ids = [species.id_of(name) for name in data["species_names"].tolist()]
+            for pos, saved_id, stage, last_time, needs_water in zip(
+                    data["plant_pos"].tolist(), data["plant_species"].tolist(), data["plant_stage"].tolist(),
+                    data["plant_last_time"].tolist(), data["plant_needs_water"].tolist()):
+                plant = Plant(simulation, tuple(pos), ids[saved_id])
+                plant.stage = stage
+                plant.last_time = last_time
+                plant.needs_water = needs_water
+                plant.done_growing = stage == species.stage_counts[plant.species] - 1
+                simulation.insert_plant(plant)
+            # Older saves have no wanderers.
+            if "entity_pos" in data:
+                simulation.entities.add(data["entity_pos"], data["entity_kind"], data["entity_dir"])
+        return simulation
 
     def update_ticks(self, amount: int = 1):
         """Update the simulation by some amount of ticks."""
         self.global_time += amount
+        # Spread the water through the soil.
+        self.moisture.step(self.grid, amount)
         # Update all the plants.
         for plant in self.plants.values():
             plant.update()
+        # Let grown plants seed their neighbors.
+        self.spread_plants(amount)
+        # Log the plant counts for growth analytics.
+        self.stats.sample(self.global_time)
+        # Move the wanderers one tick at a time, marking the cells they left and entered all at once.
+        if len(self.entities):
+            changed = [self.entities.step(self.grid, self.rng) for _ in range(amount)]
+            self.updates.update(map(tuple, np.concatenate(changed).tolist()))
+
+    def spread_plants(self, ticks: int = 1):
+        """Give every free cell next to grown spreading plants a chance to grow a new plant.
+        Runs on the whole grid at once, so only the new plants are handled one by one."""
+        empty = self.plant_species < 0
+        for species in np.flatnonzero(self.species.spread > 0).tolist():
+            source = self.mature & (self.plant_species == species)
+            if not source.any():
+                continue
+            # Count the grown plants of this species orthogonally next to every cell.
+            neighbors = np.zeros(self.size, np.int8)
+            neighbors[1:] += source[:-1]
+            neighbors[:-1] += source[1:]
+            neighbors[:, 1:] += source[:, :-1]
+            neighbors[:, :-1] += source[:, 1:]
+            # Only free cells with valid tiles next to a parent can be seeded.
+            candidates = empty & (neighbors > 0) & self.species.valid[species][self.grid]
+            xs, ys = np.nonzero(candidates)
+            # Every parent gets its own roll on every tick. Widen the counts first, so long catch ups can't overflow.
+            chance = 1 - (1 - self.species.spread[species]) ** (neighbors[xs, ys].astype(np.int64) * ticks)
+            born = self.rng.random(len(xs)) < chance
+            xs, ys = xs[born], ys[born]
+            # Grow the new plants.
+            empty[xs, ys] = False
+            for pos in zip(xs.tolist(), ys.tolist()):
+                self.add_plant(pos, species)
+
+
+class TickClock:
+    """Fixed timestep clock that turns wall clock time into simulation ticks."""
+    def __init__(self, tick_rate: float, max_catchup: int = 10):
+        """Create a clock giving tick_rate ticks per second.
+        No more than max_catchup ticks are given at once, the rest of a stall is dropped."""
+        if tick_rate <= 0:
+            raise ValueError("Tick rate must be above zero.")
+        self.tick_length = 1 / tick_rate
+        self.max_catchup = max_catchup
+        # Time that has passed but not yet been turned into ticks.
+        self.accumulator = 0.0
+        self.last_time = time.perf_counter()
+        # The total number of ticks dropped by the catch up limit.
+        self.dropped = 0
+
+    def advance(self) -> int:
+        """Returns the number of ticks due since the last call."""
+        # Add the elapsed wall clock time.
+        now = time.perf_counter()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        # Take out as many whole ticks as fit.
+        ticks = int(self.accumulator // self.tick_length)
+        self.accumulator -= ticks * self.tick_length
+        # Drop ticks past the limit so a stall can't snowball into longer and longer frames.
+        if ticks > self.max_catchup:
+            self.dropped += ticks - self.max_catchup
+            ticks = self.max_catchup
+        return ticks
+
+    def time_until_tick(self) -> float:
+        """Returns the seconds left until the next tick is due."""
+        elapsed = self.accumulator + time.perf_counter() - self.last_time
+        return max(0.0, self.tick_length - elapsed)
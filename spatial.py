@@ -0,0 +1,111 @@
+"""This file holds the spatial index used for area queries on the world."""
+
+# Description:
+#   The following class SpatialIndex is used to find everything inside an area of the world quickly.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because area queries can be asked without knowing how the positions are stored.
+#   This class uses encapsulation because it holds both the buckets of positions and the functions that
+#   keep them in order and search them.
+
+import math
+from typing import Any, Iterable
+
+from bitfont import point_in_circle, point_in_rect
+
+
+class SpatialIndex:
+    """Grid bucket index mapping positions to values."""
+    def __init__(self, bucket_size: int = 8):
+        """Create an empty index with square buckets of the given size."""
+        # The width and height of every bucket in cells.
+        self.bucket_size = bucket_size
+        # Buckets of positions, keyed by bucket coordinates.
+        self.buckets: dict[tuple[int, int], dict[tuple[int, int], Any]] = {}
+        # The number of positions in the index.
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def bucket_of(self, pos: tuple[int, int]) -> tuple[int, int]:
+        """Returns the coordinates of the bucket holding the given position."""
+        return pos[0] // self.bucket_size, pos[1] // self.bucket_size
+
+    def insert(self, pos: tuple[int, int], value: Any):
+        """Store a value at the given position, replacing any value already there."""
+        bucket = self.buckets.setdefault(self.bucket_of(pos), {})
+        if pos not in bucket:
+            self.count += 1
+        bucket[pos] = value
+
+    def remove(self, pos: tuple[int, int]):
+        """Remove the value at the given position."""
+        key = self.bucket_of(pos)
+        bucket = self.buckets[key]
+        del bucket[pos]
+        self.count -= 1
+        # Drop empty buckets so queries never visit them.
+        if not bucket:
+            del self.buckets[key]
+
+    def get(self, pos: tuple[int, int], default: Any = None) -> Any:
+        """Returns the value at the given position, or default."""
+        bucket = self.buckets.get(self.bucket_of(pos), None)
+        return default if bucket is None else bucket.get(pos, default)
+
+    def _buckets_in(self, left: int, top: int, right: int, bottom: int):
+        """Yields the keys and rects of the stored buckets overlapping the inclusive cell bounds."""
+        size = self.bucket_size
+        for bx in range(left // size, right // size + 1):
+            for by in range(top // size, bottom // size + 1):
+                if (bx, by) in self.buckets:
+                    yield (bx, by), (bx * size, by * size, size, size)
+
+    def query_rect(self, rect: tuple[int, int, int, int]) -> list:
+        """Returns the values inside the rect (x, y, w, h).
+        Covers the same cells as bitfont.draw_rect(rect, True)."""
+        x, y, w, h = rect
+        values = []
+        if w <= 0 or h <= 0:
+            return values
+        for key, bucket_rect in self._buckets_in(x, y, x + w - 1, y + h - 1):
+            bucket = self.buckets[key]
+            # Buckets fully inside the rect need no per position test.
+            if x <= bucket_rect[0] and y <= bucket_rect[1] and \
+                    bucket_rect[0] + bucket_rect[2] <= x + w and bucket_rect[1] + bucket_rect[3] <= y + h:
+                values.extend(bucket.values())
+            else:
+                values.extend(value for pos, value in bucket.items() if point_in_rect(pos, rect))
+        return values
+
+    def query_circle(self, center: tuple[float, float], radius: float) -> list:
+        """Returns the values inside the circle.
+        Uses the same point_in_circle test as bitfont.draw_circle with a width of zero."""
+        values = []
+        if radius < 0:
+            return values
+        left, right = math.ceil(center[0] - radius), math.floor(center[0] + radius)
+        top, bottom = math.ceil(center[1] - radius), math.floor(center[1] + radius)
+        for key, (bx, by, bw, bh) in self._buckets_in(left, top, right, bottom):
+            bucket = self.buckets[key]
+            # A circle is convex, so a bucket is inside it when all four corners are.
+            corners = ((bx, by), (bx + bw - 1, by), (bx, by + bh - 1), (bx + bw - 1, by + bh - 1))
+            if all(point_in_circle(corner, center, radius) for corner in corners):
+                values.extend(bucket.values())
+            else:
+                values.extend(value for pos, value in bucket.items() if point_in_circle(pos, center, radius))
+        return values
+
+    def query_points(self, points: Iterable[tuple[int, int]]) -> list:
+        """Returns the values at any of the given points.
+        Use with any other shape from bitfont.draw, such as lines or outlines."""
+        values = []
+        for pos in points:
+            bucket = self.buckets.get(self.bucket_of(pos), None)
+            if bucket is not None and pos in bucket:
+                values.append(bucket[pos])
+        return values
@@ -0,0 +1,110 @@
+"""This file holds the species registry that turns plant data into lookup tables."""
+
+# Description:
+#   The following class SpeciesRegistry is used to give every plant species an id and table rows.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because plants and seeds only need a species id, not the species data.
+#   This class uses encapsulation because it holds both the compiled tables and the functions that
+#   register new species and rebuild the tables.
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Value used in the durations table for stages that never end.
+NO_DURATION = -1
+
+
+class SpeciesRegistry:
+    """Assigns integer ids to plant species and compiles their stages into arrays.
+    Tables are indexed with [species] or [species, stage]."""
+    def __init__(self):
+        """Create an empty registry."""
+        # Raw species data, indexed by species id.
+        self.names: list[str] = []
+        self.valid_tiles: list[tuple[int, ...]] = []
+        self.stages: list[list[dict]] = []
+        self.spread_chances: list[float] = []
+        # Quick lookup of species ids based on name.
+        self.ids: dict[str, int] = {}
+        # Build the empty tables.
+        self.compile()
+
+    def __len__(self):
+        return len(self.names)
+
+    def register(self, name: str, valid_tiles: tuple[int, ...], stages: list[dict], spread: float = 0.0) -> int:
+        """Add a species and return its id. The stages use the same dicts as the data in inventory.py.
+        Grown plants seed each free, valid, orthogonal neighbor with the spread chance every tick.
+        If the stages can't be compiled, the error is raised and nothing is registered."""
+        if name in self.ids:
+            raise ValueError(f"Species already registered: {name}")
+        if not stages:
+            raise ValueError(f"Species must have at least one stage: {name}")
+        self.ids[name] = len(self.names)
+        self.names.append(name)
+        self.valid_tiles.append(tuple(valid_tiles))
+        self.stages.append(stages)
+        self.spread_chances.append(spread)
+        # Rebuild the tables with the new species in them.
+        try:
+            self.compile()
+        except Exception:
+            # Take the bad species back out, so the registry is left as it was.
+            del self.ids[name]
+            for data in (self.names, self.valid_tiles, self.stages, self.spread_chances):
+                data.pop()
+            self.compile()
+            raise
+        return self.ids[name]
+
+    def compile(self):
+        """Rebuild the lookup tables from the raw species data."""
+        count = len(self.names)
+        max_stages = max((len(stages) for stages in self.stages), default=1)
+        # Number of stages of every species.
+        self.stage_counts = np.array([len(stages) for stages in self.stages], np.int16)
+        # Ticks each stage lasts before growing, NO_DURATION for the last stage.
+        self.durations = np.full((count, max_stages), NO_DURATION, np.int32)
+        # Tile ID and foreground color of every stage.
+        self.tiles = np.zeros((count, max_stages), np.uint8)
+        self.colors = np.zeros((count, max_stages, 3), np.uint8)
+        # Whether a stage has to be watered before it grows.
+        self.water = np.zeros((count, max_stages), np.bool_)
+        # Chance per tick for a grown plant to seed a neighbor.
+        self.spread = np.array(self.spread_chances, np.float64)
+        # Which grid tile values every species can be planted on.
+        self.valid = np.zeros((count, 256), np.bool_)
+        for species, stages in enumerate(self.stages):
+            self.valid[species, list(self.valid_tiles[species])] = True
+            tile = None
+            for stage, data in enumerate(stages):
+                # Stages without a tile keep the tile of the stage before.
+                tile = data.get("tile", None) or tile
+                if tile is None:
+                    raise ValueError(f"First stage needs a tile: {self.names[species]}")
+                self.tiles[species, stage] = tile[0]
+                self.colors[species, stage] = tile[1]
+                self.durations[species, stage] = data.get("time", NO_DURATION)
+                self.water[species, stage] = data.get("water", False)
+            # The last stage never ends.
+            self.durations[species, len(stages) - 1] = NO_DURATION
+
+    def id_of(self, name: str) -> int:
+        """Returns the id of the species with the given name. Unknown names raise a KeyError."""
+        return self.ids[name]
+
+    def load(self, path: Path) -> list[int]:
+        """Register every species in a JSON data file and return their ids.
+        The file holds a list of objects with name, valid_tiles, stages, and optional spread keys.
+        Tiles are written as lists, [tile_id, [r, g, b], null]."""
+        with open(path) as file:
+            data = json.load(file)
+        return [self.register(species["name"], tuple(species["valid_tiles"]), species["stages"],
+                              species.get("spread", 0.0))
+                for species in data]
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+"""This file holds the spectator server that streams the screen cells, and the viewer that shows them."""
+
+# Description:
+#   The following class SpectatorServer is used to let other screens watch the garden over a socket.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the game only publishes its frames, not caring who watches.
+#   This class uses encapsulation because it holds the event loop, the spectators, and the last frame
+#   sent, along with the functions that send the differences.
+
+# Description:
+#   The following class Spectator is used to hold the connection and queue of one watching screen.
+#
+# OOP Principles Used:
+#   Encapsulation
+#
+# Reasoning:
+#   This class uses encapsulation because it keeps the state of one spectator together.
+
+# Description:
+#   The following class SpectatorClient is used to receive the frames of a spectator server.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because the viewer only applies finished frames to its surface.
+#   This class uses encapsulation because it holds both the socket and the thread that reads it.
+
+import argparse
+import asyncio
+import queue
+import socket
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pygame as pg
+
+import bitfont as bf
+
+# Port the server listens on by default.
+DEFAULT_PORT = 8437
+# Message kinds. A keyframe holds every cell and a delta holds the cells changed since the last message.
+KEYFRAME = 1
+DELTA = 2
+# Kind and payload length at the start of every message.
+HEADER = struct.Struct(">BI")
+# Width and height at the start of a keyframe, and the cell count at the start of a delta.
+KEYFRAME_HEADER = struct.Struct(">HH")
+DELTA_HEADER = struct.Struct(">I")
+
+
+def encode_keyframe(tiles: np.ndarray, fg: np.ndarray, bg: np.ndarray) -> bytes:
+    """Returns a compressed keyframe message of whole cell arrays."""
+    payload = zlib.compress(KEYFRAME_HEADER.pack(*tiles.shape) + tiles.tobytes() + fg.tobytes() + bg.tobytes(), 1)
+    return HEADER.pack(KEYFRAME, len(payload)) + payload
+
+
+def encode_delta(indices: np.ndarray, tiles: np.ndarray, fg: np.ndarray, bg: np.ndarray) -> bytes:
+    """Returns a compressed delta message of the cells at the given flat indices."""
+    payload = zlib.compress(DELTA_HEADER.pack(len(indices)) + indices.astype("<u4").tobytes() +
+                            tiles.tobytes() + fg.tobytes() + bg.tobytes(), 1)
+    return HEADER.pack(DELTA, len(payload)) + payload
+
+
+def decode(kind: int, payload: bytes) -> tuple:
+    """Returns the arrays of a message. Keyframes give (KEYFRAME, tiles, fg, bg) and
+    deltas give (DELTA, indices, tiles, fg, bg)."""
+    data = zlib.decompress(payload)
+    if kind == KEYFRAME:
+        w, h = KEYFRAME_HEADER.unpack_from(data)
+        cells = np.frombuffer(data, np.uint8, offset=KEYFRAME_HEADER.size)
+        return (KEYFRAME, cells[:w * h].reshape(w, h), cells[w * h:w * h * 4].reshape(w, h, 3),
+                cells[w * h * 4:].reshape(w, h, 3))
+    count, = DELTA_HEADER.unpack_from(data)
+    indices = np.frombuffer(data, "<u4", count, DELTA_HEADER.size)
+    cells = np.frombuffer(data, np.uint8, offset=DELTA_HEADER.size + count * 4)
+    return DELTA, indices, cells[:count], cells[count:count * 4].reshape(count, 3), cells[count * 4:].reshape(count, 3)
+
+
+class Spectator:
+    """One connected spectator and the messages waiting to be sent to it."""
+    def __init__(self, writer: asyncio.StreamWriter, max_queue: int):
+        self.writer = writer
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(max_queue)
+        # Whether the spectator has every message since its last keyframe. Deltas are only sent when it does.
+        self.synced = False
+
+
+class SpectatorServer:
+    """Publishes the cells of a Surface to any number of spectators over TCP.
+    The frame loop only finds the changed cells, while an asyncio loop on its own thread compresses and
+    sends them. A spectator that falls behind is dropped, and gets a keyframe of the latest cells once it
+    has read everything queued for it."""
+    def __init__(self, surface: bf.Surface, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 keyframe_interval: int = 300, max_queue: int = 8):
+        """Serve the surface on host and port. Every keyframe_interval published frames, all spectators get
+        a keyframe. At most max_queue messages wait for each spectator before it is dropped."""
+        self.surface = surface
+        self.host, self.port = host, port
+        self.keyframe_interval = keyframe_interval
+        self.max_queue = max_queue
+        # The cells last published, used by publish on the game thread.
+        self.tile_buffer: Union[np.ndarray, None] = None
+        self.fg_buffer: Union[np.ndarray, None] = None
+        self.bg_buffer: Union[np.ndarray, None] = None
+        # The same cells kept by the server thread, to make keyframes from whenever they are needed.
+        self.mirror: Union[tuple[np.ndarray, np.ndarray, np.ndarray], None] = None
+        # The keyframe of the mirror, once made, and the number of the frame it was made from.
+        self.keyframe: tuple[int, bytes] = (-1, b'')
+        self.frame = 0
+        # The connected spectators and the tasks serving them.
+        self.spectators: set[Spectator] = set()
+        self.handlers: set[asyncio.Task] = set()
+        # Statistics of the bytes queued and the times spectators were dropped.
+        self.bytes_sent = 0
+        self.skipped = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.thread = threading.Thread(target=self._run, name="spectate", daemon=True)
+
+    def start(self):
+        """Start serving on the background thread. Errors opening the socket are raised here."""
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port))
+        # Find the real port when port 0 asked for any free one.
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread.start()
+
+    def _run(self):
+        """Run the event loop until closed."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def close(self):
+        """Disconnect every spectator and stop the server."""
+        if not self.thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _shutdown(self):
+        """Close the listening socket and every connection."""
+        self.server.close()
+        # Closing the connections ends their handlers. Abort them, since a stalled spectator never reads
+        # what is still buffered for it.
+        for spectator in list(self.spectators):
+            spectator.writer.transport.abort()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def publish(self):
+        """Send the changes to the surface since the last call. Called once per frame by the game."""
+        surface = self.surface
+        # Spectators get RGB colors, whether the surface is in palette mode or not.
+        fg, bg = surface.fg_rgb(), surface.bg_rgb()
+        if self.tile_buffer is None:
+            # The first frame sends every cell.
+            update = None, surface.tile_array.copy(), fg.copy(), bg.copy()
+        else:
+            # Find the changed cells by their flat index.
+            changed = np.flatnonzero((surface.tile_array != self.tile_buffer) |
+                                     (fg != self.fg_buffer).any(2) | (bg != self.bg_buffer).any(2))
+            if not len(changed):
+                return
+            update = (changed, surface.tile_array.reshape(-1)[changed],
+                      fg.reshape(-1, 3)[changed], bg.reshape(-1, 3)[changed])
+        # Remember what was published.
+        self.tile_buffer = surface.tile_array.copy()
+        self.fg_buffer = fg.copy()
+        self.bg_buffer = bg.copy()
+        # Compress and send on the server thread.
+        self.loop.call_soon_threadsafe(self._broadcast, *update)
+
+    def keyframe_message(self) -> bytes:
+        """Returns a keyframe of the latest frame, made at most once per frame."""
+        if self.keyframe[0] != self.frame:
+            self.keyframe = self.frame, encode_keyframe(*self.mirror)
+        return self.keyframe[1]
+
+    def _broadcast(self, indices: Union[np.ndarray, None], tiles: np.ndarray, fg: np.ndarray, bg: np.ndarray):
+        """Apply a published frame to the mirror and queue it for every spectator.
+        Indices of None means the arrays hold every cell."""
+        if indices is None:
+            self.mirror = tiles, fg, bg
+        else:
+            self.mirror[0].reshape(-1)[indices] = tiles
+            self.mirror[1].reshape(-1, 3)[indices] = fg
+            self.mirror[2].reshape(-1, 3)[indices] = bg
+        self.frame += 1
+        periodic = indices is None or self.frame % self.keyframe_interval == 0
+        delta = None
+        for spectator in self.spectators:
+            if not spectator.synced:
+                # Dropped and new spectators wait for their queue to empty, then get a keyframe.
+                if not spectator.queue.empty():
+                    continue
+                message = self.keyframe_message()
+                spectator.synced = True
+            elif periodic:
+                message = self.keyframe_message()
+            else:
+                # Compress the delta once, and only if someone needs it.
+                if delta is None:
+                    delta = encode_delta(indices, tiles, fg, bg)
+                message = delta
+            try:
+                spectator.queue.put_nowait(message)
+                self.bytes_sent += len(message)
+            except asyncio.QueueFull:
+                # The spectator is too slow, so drop what is queued for it.
+                while not spectator.queue.empty():
+                    spectator.queue.get_nowait()
+                spectator.synced = False
+                self.skipped += 1
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one spectator until it disconnects."""
+        spectator = Spectator(writer, self.max_queue)
+        self.spectators.add(spectator)
+        self.handlers.add(asyncio.current_task())
+        sender = asyncio.ensure_future(self._send(spectator))
+        try:
+            # Spectators send nothing, so reading only finds out when they leave.
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            self.handlers.discard(asyncio.current_task())
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, spectator: Spectator):
+        """Write the queued messages of a spectator as fast as it reads them."""
+        try:
+            while True:
+                if not spectator.synced and spectator.queue.empty() and self.mirror is not None:
+                    # The spectator is new or was dropped and has caught up, so send it the latest frame.
+                    spectator.synced = True
+                    message = self.keyframe_message()
+                    self.bytes_sent += len(message)
+                else:
+                    message = await spectator.queue.get()
+                spectator.writer.write(message)
+                await spectator.writer.drain()
+        except ConnectionError:
+            pass
+
+
+class SpectatorClient:
+    """Connects to a spectator server and decodes its messages on a background thread."""
+    def __init__(self, host: str, port: int):
+        """Connect to the server at host and port."""
+        self.socket = socket.create_connection((host, port))
+        # Decoded messages, and None once the server is gone.
+        self.messages: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="spectate client", daemon=True)
+        self.thread.start()
+
+    def _receive(self, size: int) -> bytes:
+        """Read exactly size bytes, raising ConnectionError if the server disconnects."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Spectator server disconnected.")
+            data += chunk
+        return bytes(data)
+
+    def _run(self):
+        """Read messages until the server disconnects."""
+        try:
+            while True:
+                kind, length = HEADER.unpack(self._receive(HEADER.size))
+                self.messages.put(decode(kind, self._receive(length)))
+        except (ConnectionError, OSError):
+            self.messages.put(None)
+
+    def close(self):
+        """Disconnect from the server."""
+        # Shut down first, so the server sees the disconnect even while the thread is reading.
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+def apply_message(surface: bf.Surface, message: tuple):
+    """Apply a decoded message to a surface of the same size, marking the changed cells."""
+    kind, *cells = message
+    # Messages hold RGB colors, so turn them into palette indices for a surface in palette mode.
+    if surface.palette is not None:
+        cells[-2:] = surface.palette.indices(cells[-2]), surface.palette.indices(cells[-1])
+    if kind == KEYFRAME:
+        surface.tile_array[...], surface.fg_array[...], surface.bg_array[...] = cells
+        surface.flip = True
+        return
+    indices, tiles, fg, bg = cells
+    xs, ys = np.unravel_index(indices, surface.size)
+    surface.tile_array[xs, ys] = tiles
+    surface.fg_array[xs, ys] = fg
+    surface.bg_array[xs, ys] = bg
+    surface.points.update(zip(xs.tolist(), ys.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a garden served with main.py --spectate.")
+    parser.add_argument("port", type=int, nargs="?", default=DEFAULT_PORT, help="port of the garden")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the garden")
+    args = parser.parse_args()
+
+    pg.init()
+    screen = pg.display.set_mode((320, 240))
+    pg.display.set_caption("Final Project Spectator")
+    font = bf.Font(Path() / 'bitfont' / 'fonts' / 'CP437_12x12.png')
+    client = SpectatorClient(args.host, args.port)
+    cell_screen = None
+    clock = pg.time.Clock()
+    while True:
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                client.close()
+                pg.quit()
+                return
+        # Apply every message that arrived since the last frame.
+        while not client.messages.empty():
+            message = client.messages.get()
+            if message is None:
+                print("The garden closed.")
+                pg.quit()
+                return
+            # Resize the window to the first keyframe, or any keyframe of a new size.
+            if message[0] == KEYFRAME and (cell_screen is None or cell_screen.size != message[1].shape):
+                screen = pg.display.set_mode((message[1].shape[0] * font.pixel_width,
+                                              message[1].shape[1] * font.pixel_height))
+                cell_screen = bf.PygameSurface(message[1].shape, font)
+            if cell_screen is not None:
+                apply_message(cell_screen, message)
+        if cell_screen is not None:
+            cell_screen.update(screen)
+        pg.display.flip()
+        clock.tick(60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""This file holds the live statistics of the plants in the garden."""
+
+# Description:
+#   The following class GardenStats is used to count the plants of the garden by species, stage, and status.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because callers ask how many plants there are of a kind, not how they are counted.
+#   This class uses encapsulation because it holds the counters along with the functions that keep them
+#   up to date as plants are added, removed, grow, and are watered.
+
+import csv
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from species import SpeciesRegistry
+
+# Simulation ticks between the rows of the statistics log by default.
+LOG_INTERVAL = 100
+
+
+class GardenStats:
+    """Counters of the plants in a simulation, kept up to date one plant at a time so queries never scan the plants.
+    The simulation counts a plant out before it changes and back in after, with count.
+    The species must all be registered before the counters are made."""
+    def __init__(self, species: SpeciesRegistry, log_interval: int = 0):
+        """Create empty counters for the given species.
+        When log_interval is above zero, sample adds a row to the log every log_interval ticks."""
+        self.species = species
+        # Plants by species and stage, plants by species, and plants needing water and done growing by species.
+        self.stages = np.zeros((len(species), species.durations.shape[1]), np.int64)
+        self.species_counts = np.zeros(len(species), np.int64)
+        self.thirsty_counts = np.zeros(len(species), np.int64)
+        self.grown_counts = np.zeros(len(species), np.int64)
+        # The totals of all species.
+        self.total = 0
+        self.total_thirsty = 0
+        self.total_grown = 0
+        # Rows of the time, the totals, and the plants and grown plants of every species.
+        self.log_interval = log_interval
+        self.log: list[tuple[int, ...]] = []
+        self.next_sample = 0
+
+    def count(self, plant, sign: int = 1):
+        """Count a plant in its current stage and status, or count it out when sign is -1."""
+        self.stages[plant.species, plant.stage] += sign
+        self.species_counts[plant.species] += sign
+        self.total += sign
+        if plant.needs_water:
+            self.thirsty_counts[plant.species] += sign
+            self.total_thirsty += sign
+        if plant.done_growing:
+            self.grown_counts[plant.species] += sign
+            self.total_grown += sign
+
+    def _id(self, species: Union[int, str]) -> int:
+        """Returns the id of a species given by id or name."""
+        return self.species.id_of(species) if isinstance(species, str) else species
+
+    def plants(self, species: Union[int, str] = None, stage: int = None) -> int:
+        """Returns the number of plants, of a species by id or name and in a stage if given."""
+        if species is None:
+            return self.total
+        species = self._id(species)
+        if stage is None:
+            return int(self.species_counts[species])
+        return int(self.stages[species, stage])
+
+    def thirsty(self, species: Union[int, str] = None) -> int:
+        """Returns the number of plants needing water, of a species by id or name if given."""
+        if species is None:
+            return self.total_thirsty
+        return int(self.thirsty_counts[self._id(species)])
+
+    def grown(self, species: Union[int, str] = None) -> int:
+        """Returns the number of plants done growing, of a species by id or name if given."""
+        if species is None:
+            return self.total_grown
+        return int(self.grown_counts[self._id(species)])
+
+    def sample(self, global_time: int):
+        """Add a row to the log if the log interval passed since the last row."""
+        if self.log_interval <= 0 or global_time < self.next_sample:
+            return
+        self.log.append((global_time, self.total, self.total_thirsty, self.total_grown,
+                         *self.species_counts.tolist(), *self.grown_counts.tolist()))
+        self.next_sample = global_time - global_time % self.log_interval + self.log_interval
+
+    def write_log(self, path: Path):
+        """Write the log to a CSV file at path, with a column for the plants and grown plants of every species."""
+        names = self.species.names
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["time", "plants", "thirsty", "grown", *names, *(f"{name} grown" for name in names)])
+            writer.writerows(self.log)
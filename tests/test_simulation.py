@@ -0,0 +1,18 @@
+"""Tests for the simulation."""
+
+from inventory import SPECIES
+from simulation import Simulation
+
+
+def test_long_catch_up_spreads_plants():
+    # A 5x5 dirt garden with grass in the middle, which grows up on the first tick.
+    simulation = Simulation((5, 5), SPECIES, seed=0)
+    simulation.grid[...] = 1
+    grass = SPECIES.id_of("Grass")
+    simulation.add_plant((2, 2), grass)
+    simulation.update_ticks()
+    assert simulation.mature[2, 2]
+    # Enough ticks that every neighbor is all but sure to be seeded, and far past the int8 range.
+    simulation.update_ticks(20000)
+    for pos in ((1, 2), (3, 2), (2, 1), (2, 3)):
+        assert simulation.plant_species[pos] == grass
@@ -0,0 +1,91 @@
+"""This file holds the procedural terrain generator."""
+
+# Description:
+#   The following class TerrainGenerator is used to create the water, dirt, and farmland of the world.
+#
+# OOP Principles Used:
+#   Abstraction and Encapsulation
+#
+# Reasoning:
+#   This class uses abstraction because any region of the world can be asked for without knowing how
+#   the noise behind it works.
+#   This class uses encapsulation because it holds both the terrain settings and the functions that
+#   turn them into tiles.
+
+import numpy as np
+
+# Large odd constants used to hash lattice points.
+_PRIME_X = np.uint64(0x9E3779B97F4A7C15)
+_PRIME_Y = np.uint64(0xC2B2AE3D27D4EB4F)
+_PRIME_SEED = 0x165667B19E3779F9
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+
+
+def lattice_values(xs: np.ndarray, ys: np.ndarray, seed: int) -> np.ndarray:
+    """Returns a repeatable random float from 0 to 1 for every integer lattice point."""
+    # Wrap the coordinates into unsigned integers so the math overflows instead of failing.
+    h = xs.astype(np.int64).view(np.uint64) * _PRIME_X
+    h ^= ys.astype(np.int64).view(np.uint64) * _PRIME_Y
+    h ^= np.uint64(seed * _PRIME_SEED & 0xFFFFFFFFFFFFFFFF)
+    # Mix the bits so nearby points look unrelated.
+    h ^= h >> np.uint64(33)
+    h *= _MIX
+    h ^= h >> np.uint64(33)
+    # Keep the top 24 bits as a fraction.
+    return (h >> np.uint64(40)).astype(np.float32) / (1 << 24)
+
+
+def value_noise(xs: np.ndarray, ys: np.ndarray, seed: int) -> np.ndarray:
+    """Returns smooth noise from 0 to 1 at the given float coordinates.
+    The lattice points are one unit apart and the noise only depends on the coordinates and seed."""
+    x0, y0 = np.floor(xs), np.floor(ys)
+    # Smoothstep the fractions so the noise has no creases along the lattice.
+    tx, ty = xs - x0, ys - y0
+    tx = tx * tx * (3 - 2 * tx)
+    ty = ty * ty * (3 - 2 * ty)
+    x0, y0 = x0.astype(np.int64), y0.astype(np.int64)
+    # Blend the values of the four surrounding lattice points.
+    top = lattice_values(x0, y0, seed) * (1 - tx) + lattice_values(x0 + 1, y0, seed) * tx
+    bottom = lattice_values(x0, y0 + 1, seed) * (1 - tx) + lattice_values(x0 + 1, y0 + 1, seed) * tx
+    return top * (1 - ty) + bottom * ty
+
+
+def fractal_noise(xs: np.ndarray, ys: np.ndarray, seed: int, octaves: int) -> np.ndarray:
+    """Returns value noise from 0 to 1 with octaves of finer and finer detail added."""
+    total = np.zeros(np.broadcast(xs, ys).shape, np.float32)
+    amplitude, frequency, weight = 1.0, 1.0, 0.0
+    for octave in range(octaves):
+        total += amplitude * value_noise(xs * frequency, ys * frequency, seed + octave)
+        weight += amplitude
+        amplitude /= 2
+        frequency *= 2
+    return total / weight
+
+
+class TerrainGenerator:
+    """Seeded generator of grid tiles for any region of an endless world."""
+    def __init__(self, seed: int, scale: float = 16.0, water_level: float = 0.4,
+                 farmland_level: float = 0.72, octaves: int = 3):
+        """Create a generator. The scale is the size of the biggest features in cells.
+        Cells below the water level are water, and dirt above the farmland level is farmland."""
+        self.seed = seed
+        self.scale = scale
+        self.water_level = water_level
+        self.farmland_level = farmland_level
+        self.octaves = octaves
+
+    def region(self, rect: tuple[int, int, int, int]) -> np.ndarray:
+        """Returns a (w, h) uint8 array of the tiles in the rect (x, y, w, h).
+        The same cell always gets the same tile, whatever region it is asked for in."""
+        x, y, w, h = rect
+        # Make the cell coordinates of the region, in noise units.
+        xs = (np.arange(x, x + w, dtype=np.float64)[:, None] + 0.5) / self.scale
+        ys = (np.arange(y, y + h, dtype=np.float64)[None, :] + 0.5) / self.scale
+        xs, ys = np.broadcast_arrays(xs, ys)
+        # The height decides between water and land, and a second noise marks the farmland.
+        height = fractal_noise(xs, ys, self.seed, self.octaves)
+        fertility = fractal_noise(xs * 2, ys * 2, self.seed + 1000, self.octaves)
+        tiles = np.ones((w, h), np.uint8)
+        tiles[fertility > self.farmland_level] = 2
+        tiles[height < self.water_level] = 0
+        return tiles